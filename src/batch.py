@@ -0,0 +1,387 @@
+from typing import Dict, List, Optional, Tuple
+import re
+import os
+
+import click
+
+from .main import SizeParam, VerseKeyParam, VerseKeyRange, expand_keys
+from .config import CACHE_DIR
+from .verse import (
+    get_reciter_config,
+    prefetch_verses,
+    verse_info_by_key,
+    with_translation,
+    extract_clips,
+    translate_clips,
+    release_decoded_audio,
+)
+from .verse.config import RECITERS, TRANSLATION_LANGUAGES
+from .verse.types import VerseKey, VerseInformation, Reciter
+from .renderer.config import TRANSITION_NAMES, PIPELINE_DEPTH
+from .renderer.glyphs import GLYPHS
+from .renderer.fonts import FONTS
+from .renderer.pipelined import PIPELINE_STATS
+from .encoder import PROFILES, ENCODE_STATS
+from .utilities import CACHE, PREFETCHER, concat_videos
+from .manifest import Manifest
+from .profiling import PROFILER
+from .pipeline import (
+    RenderSettings,
+    load_verse,
+    render_clips,
+    verse_inputs,
+    verbose_echo,
+)
+
+# (reciter name, language)
+Variant = Tuple[str, str]
+
+
+def slug(name: str) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", name.lower()).strip("-")
+
+
+class Translations:
+    """every verse fetched once per language, its timings are not used"""
+
+    def __init__(self, reciter: Reciter) -> None:
+        self.reciter = reciter
+        self.verses: Dict[Tuple[str, str], VerseInformation] = {}
+
+    def get(self, key: VerseKey, lang: str) -> VerseInformation:
+        verse = self.verses.get((str(key), lang))
+        if verse is None:
+            verse = verse_info_by_key(key, self.reciter, lang)
+            self.verses[(str(key), lang)] = verse
+
+        return verse
+
+
+def render_batch(
+    settings: RenderSettings,
+    verse_key: List[VerseKeyRange],
+    reciters: List[Reciter],
+    langs: List[str],
+    resume: bool = True,
+    prefetch: bool = True,
+    verbose: bool = False,
+) -> Tuple[Dict[Variant, str], int]:
+    """
+    the verses of `verse_key` for every reciter and language, each in its own
+    directory of `settings.dist`; the renderer, and so the layouts and glyphs,
+    is shared by all of them and the clips of a recitation are extracted once
+    for all of its languages. returns the videos by variant and the failures
+    """
+    # the text and timings once per reciter, the translations once per language
+    keys = expand_keys(verse_key, reciters[0], verbose, lang=langs[0])
+    for reciter in reciters[1:]:
+        expand_keys(verse_key, reciter, verbose, lang=langs[0])
+    for lang in langs[1:]:
+        expand_keys(verse_key, reciters[0], verbose, lang=lang)
+
+    if prefetch:
+        for reciter in reciters:
+            prefetch_verses(
+                keys, reciter, langs[0], chapter_audio=settings.chapter_audio
+            )
+        for lang in langs[1:]:
+            prefetch_verses(keys, reciters[0], lang)
+
+    translations = Translations(reciters[0])
+    renderer = settings.renderer()
+
+    dists: Dict[Variant, str] = {}
+    manifests: Dict[Variant, Manifest] = {}
+    videos: Dict[Variant, List[str]] = {}
+    for reciter in reciters:
+        for lang in langs:
+            variant = (reciter.name, lang)
+            dists[variant] = os.path.join(settings.dist, slug(reciter.name), lang)
+            os.makedirs(dists[variant], exist_ok=True)
+            manifests[variant] = Manifest.load(dists[variant])
+            videos[variant] = []
+
+    failures = 0
+
+    def failed(variant: Variant, key: VerseKey, inputs, error: str):
+        nonlocal failures
+        failures += 1
+        click.echo(f"[ERROR] {variant[0]} ({variant[1]}): {error}")
+        manifests[variant].failed(str(key), inputs, error)
+        manifests[variant].save(dists[variant])
+
+    for reciter in reciters:
+        for key in keys:
+            verbose_echo(verbose, f"loading verse[{key}] of {reciter.name}...")
+            verses: Dict[str, VerseInformation] = {}
+            try:
+                with PROFILER.stage("verse_info"):
+                    verse = load_verse(
+                        key, reciter, settings.chapter_audio, langs[0]
+                    )
+                    verses[langs[0]] = verse
+                    for lang in langs[1:]:
+                        translated = translations.get(key, lang)
+                        verses[lang] = with_translation(verse, translated)
+            except Exception as e:
+                for lang in langs:
+                    error = f"could not load key '{key}': {e}"
+                    failed((reciter.name, lang), key, {}, error)
+                continue
+
+            stale: Dict[str, Dict[str, str]] = {}
+            for lang in langs:
+                variant = (reciter.name, lang)
+                try:
+                    inputs = verse_inputs(settings, verses[lang])
+                except Exception as e:
+                    failed(variant, key, {}, f"key '{key}' failed: {e}")
+                    continue
+
+                manifest = manifests[variant]
+                if resume and manifest.up_to_date(str(key), inputs):
+                    click.echo(f"[SKIP] '{key}' of {variant[0]} ({lang}) is up to date")
+                    videos[variant].append(manifest.verses[str(key)].filename)
+                else:
+                    stale[lang] = inputs
+            if not stale:
+                continue
+
+            # the recitation alone decides the clips, shared by every language
+            try:
+                with PROFILER.stage("extract_clips"):
+                    clips, audio = extract_clips(verse)
+            except Exception as e:
+                for lang, inputs in stale.items():
+                    error = f"key '{key}' failed: {e}"
+                    failed((reciter.name, lang), key, inputs, error)
+                continue
+
+            try:
+                for lang, inputs in stale.items():
+                    variant = (reciter.name, lang)
+                    try:
+                        filename = render_clips(
+                            renderer,
+                            verses[lang],
+                            translate_clips(clips, verses[lang]),
+                            audio,
+                            dists[variant],
+                            encoder=settings.encoder,
+                            profile=settings.encode_profile,
+                            progress=False,
+                        )
+                    except Exception as e:
+                        failed(variant, key, inputs, f"key '{key}' failed: {e}")
+                        continue
+
+                    verbose_echo(verbose, f"rendered {filename}")
+                    videos[variant].append(filename)
+                    manifests[variant].done(str(key), inputs, filename)
+                    manifests[variant].save(dists[variant])
+            finally:
+                audio.close()
+
+    layouts = renderer.layouts
+    verbose_echo(verbose, f"layouts: {layouts.hits} hits, {layouts.misses} misses")
+
+    outputs: Dict[Variant, str] = {}
+    for variant, filenames in videos.items():
+        if not filenames:
+            continue
+
+        output = os.path.join(dists[variant], "output.mp4")
+        try:
+            with PROFILER.stage("concat"):
+                concat_videos(output, filenames)
+        except RuntimeError as e:
+            failures += 1
+            click.echo(f"[ERROR] {variant[0]} ({variant[1]}): {e}")
+            continue
+        outputs[variant] = output
+
+    return outputs, failures
+
+
+@click.command()
+@click.pass_context
+@click.option(
+    "--verse_key",
+    required=True,
+    help="which verses to render, e.g. 1:1..1:7,2:255",
+    type=VerseKeyParam(),
+)
+@click.option(
+    "--reciter",
+    "reciter_names",
+    multiple=True,
+    required=True,
+    help="a reciter to render the verses for, repeat for more",
+    type=click.Choice(list(RECITERS), case_sensitive=False),
+)
+@click.option(
+    "--lang",
+    "langs",
+    multiple=True,
+    default=["en"],
+    help="a translation language, repeat for more",
+    type=click.Choice(TRANSLATION_LANGUAGES),
+)
+@click.option(
+    "--dist",
+    default="dist",
+    help="where to store the videos, a directory per reciter and language",
+    type=click.Path(file_okay=False),
+)
+@click.option("--fps", default=30, help="Frames per second of a video.", type=int)
+@click.option(
+    "--resolution", default="540x1080", help="video resolution", type=SizeParam()
+)
+@click.option(
+    "--transition",
+    default="fade",
+    help="how clips enter and leave the frame",
+    type=click.Choice(TRANSITION_NAMES),
+)
+@click.option(
+    "--highlight/--no-highlight",
+    default=False,
+    help="highlight every word while it is recited",
+)
+@click.option(
+    "--chapter_audio",
+    is_flag=True,
+    default=False,
+    help="cut verses from the recitation of their whole chapter",
+)
+@click.option(
+    "--encoder",
+    default="ffmpeg",
+    help="pipe frames into ffmpeg, hand it still runs with durations (concat) "
+    "or write them with OpenCV and re-encode",
+    type=click.Choice(["ffmpeg", "concat", "opencv"]),
+)
+@click.option(
+    "--encode_profile",
+    default="default",
+    help="encoder settings of every video",
+    type=click.Choice(list(PROFILES)),
+)
+@click.option(
+    "--cache_dir",
+    default=CACHE_DIR,
+    help="where to cache downloaded verses, recitations and fonts",
+    type=click.Path(file_okay=False),
+)
+@click.option(
+    "--cache_size",
+    default=2048,
+    help="maximum size of the download cache in megabytes",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    help="never touch the network, only use cached downloads",
+)
+@click.option(
+    "--font_dir",
+    default=None,
+    help="directory of local page fonts (p1.ttf, ...) used instead of downloads",
+    type=click.Path(exists=True, file_okay=False),
+)
+@click.option(
+    "--frame_cache/--no-frame_cache",
+    default=True,
+    help="reuse rendered clip images from previous runs",
+)
+@click.option(
+    "--pipeline_depth",
+    default=PIPELINE_DEPTH,
+    help="frames built on another thread ahead of the encoder, 0 for none",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--resume/--no-resume",
+    default=True,
+    help="skip verses whose video is up to date in the manifest",
+)
+@click.option(
+    "--prefetch/--no-prefetch",
+    default=True,
+    help="download upcoming verses in the background while rendering",
+)
+@click.option("-v/-q", "--verbose/--quiet", default=False, help="verbose output")
+def batch(
+    ctx: click.Context,
+    verse_key: List[VerseKeyRange],
+    reciter_names: Tuple[str, ...],
+    langs: Tuple[str, ...],
+    dist: str,
+    fps: int,
+    resolution,
+    transition: str,
+    highlight: bool,
+    chapter_audio: bool,
+    encoder: str,
+    encode_profile: str,
+    cache_dir: str,
+    cache_size: int,
+    offline: bool,
+    font_dir: Optional[str],
+    frame_cache: bool,
+    pipeline_depth: int,
+    resume: bool,
+    prefetch: bool,
+    verbose: bool,
+):
+    """render the same verses for several reciters and translation languages"""
+    reciters = [get_reciter_config(name) for name in dict.fromkeys(reciter_names)]
+    langs = list(dict.fromkeys(langs))
+
+    settings = RenderSettings(
+        dist=dist,
+        height=resolution.height,
+        width=resolution.width,
+        fps=fps,
+        reciter=reciters[0],
+        frame_cache=frame_cache,
+        pipeline_depth=pipeline_depth,
+        transition=transition,
+        highlight=highlight,
+        encoder=encoder,
+        encode_profile=PROFILES[encode_profile],
+        cache_dir=cache_dir,
+        cache_size=cache_size * 1024**2,
+        offline=offline,
+        font_dir=font_dir,
+        chapter_audio=chapter_audio,
+    )
+    settings.configure_cache()
+    os.makedirs(dist, exist_ok=True)
+
+    try:
+        outputs, failures = render_batch(
+            settings, verse_key, reciters, langs, resume, prefetch, verbose
+        )
+    finally:
+        PREFETCHER.close()
+        release_decoded_audio()
+
+    for (reciter, lang), output in outputs.items():
+        click.echo(f"{reciter} ({lang}): {output}")
+
+    verbose_echo(verbose, f"cache: {CACHE.hits} hits, {CACHE.misses} misses")
+    verbose_echo(verbose, f"glyphs: {GLYPHS.hits} hits, {GLYPHS.misses} misses")
+    verbose_echo(verbose, f"fonts: {FONTS.stats()}")
+    verbose_echo(verbose, f"pipeline: {PIPELINE_STATS.summary()}")
+    click.echo(f"encode speed: {ENCODE_STATS.summary(fps)}")
+
+    if failures:
+        click.echo(f"[ERROR] {failures} verses failed, rerun to retry them")
+        ctx.exit(1)
+
+
+if __name__ == "__main__":
+    batch()
@@ -0,0 +1,28 @@
+from typing import Callable, Optional
+import time
+
+
+def measure(fn: Callable, repeat: int = 5, number: int = 1):
+    """best wall time of `number` calls to `fn`, in milliseconds per call"""
+    best = float("inf")
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        for _ in range(number):
+            fn()
+        best = min(best, (time.perf_counter() - begin) / number)
+
+    return best * 1000
+
+
+def report(
+    name: str,
+    ms: float,
+    baseline: Optional[float] = None,
+    frames: Optional[int] = None,
+):
+    line = f"{name:<40}{ms:>10.3f} ms"
+    if frames is not None:
+        line += f"{frames / ms * 1000:>10.1f} frames/s"
+    if baseline is not None:
+        line += f"{baseline / ms:>8.1f}x"
+    print(line)
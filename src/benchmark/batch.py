@@ -0,0 +1,89 @@
+import click
+
+from ..renderer import Renderer, load_font, OPEN_SANS, clips2frames
+from ..renderer.config import TRANSLATION_FONT_SIZE
+from ..renderer.glyphs import GLYPHS
+from ..verse import verse_info_by_key, extract_clips, translate_clips
+from ..verse.utilities import get_reciter_config
+from . import fixtures, measure, report
+
+RECITERS = ["Mahmoud Khalil Al-Husary", "Hani ar-Rifai", "Sa'ad al-Ghamdi"]
+
+
+def translated(verse, lang: int):
+    """`verse` in a made up language, its translations differ from any other"""
+    content = []
+    for word in verse.content:
+        translation = " ".join(f"{term}{lang}" for term in word.translation.split())
+        content.append(word.model_copy(update={"translation": translation}))
+    return verse.model_copy(update={"content": content})
+
+
+def frames(renderer: Renderer, clips) -> int:
+    return sum(repeat for _, repeat in clips2frames(renderer, clips))
+
+
+@click.command()
+@click.option("--resolution", default="540x960")
+@click.option("--fps", default=30, type=int)
+@click.option("--langs", default=3, help="translation languages", type=int)
+def main(resolution: str, fps: int, langs: int):
+    """frames of every (reciter, language) variant, one at a time or batched"""
+    fixtures.install()
+    width, height = map(int, resolution.split("x"))
+
+    reciters = [get_reciter_config(name) for name in RECITERS]
+    verses = {
+        reciter.name: [verse_info_by_key(key, reciter) for key in fixtures.VERSE_KEYS]
+        for reciter in reciters
+    }
+
+    def renderer():
+        return Renderer(
+            height=height,
+            width=width,
+            fps=fps,
+            translation_font=load_font(OPEN_SANS, TRANSLATION_FONT_SIZE),
+            frame_cache=False,
+            highlight=True,
+        )
+
+    def separately():
+        """every variant as its own run: its own renderer, clips and glyphs"""
+        total = 0
+        for reciter in reciters:
+            for lang in range(langs):
+                GLYPHS.reset()
+                current = renderer()
+                for verse in verses[reciter.name]:
+                    clips, audio = extract_clips(translated(verse, lang))
+                    audio.close()
+                    total += frames(current, clips)
+        return total
+
+    def batched():
+        """one renderer, the clips of a recitation extracted once"""
+        GLYPHS.reset()
+        current = renderer()
+        total = 0
+        for reciter in reciters:
+            for verse in verses[reciter.name]:
+                clips, audio = extract_clips(verse)
+                audio.close()
+                for lang in range(langs):
+                    translation = translated(verse, lang)
+                    total += frames(current, translate_clips(clips, translation))
+        return total
+
+    count = batched()
+    assert count == separately()
+
+    name = f"{len(reciters)} reciters x {langs} languages ({resolution}@{fps})"
+    legacy = measure(separately, repeat=3)
+    current = measure(batched, repeat=3)
+    report(f"separate runs, {name}", legacy, frames=count)
+    report(f"batch, {name}", current, baseline=legacy, frames=count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+from typing import Dict, List, Optional, Tuple
+from io import BytesIO
+import tempfile
+import json
+import wave
+import os
+import re
+
+import numpy as np
+from requests import Response
+
+from ... import utilities
+from ...verse.types import VerseKey
+
+
+FIXTURES_DIR = os.path.dirname(__file__)
+
+# Lato, under the SIL Open Font License 1.1 (embedded in the font)
+FONT_PATH = os.path.join(FIXTURES_DIR, "Lato-Regular.ttf")
+VERSES_PATH = os.path.join(FIXTURES_DIR, "verses.json")
+
+FRAME_RATE = 16000
+
+VERSE_PATTERN = re.compile(r"/verses/by_key/(\d+:\d+)")
+CHAPTER_PATTERN = re.compile(r"/by_chapter/(\d+)\?.*&page=(\d+)&per_page=(\d+)")
+AUDIO_PATTERN = re.compile(r"/fixtures/(\d+)_(\d+)\.wav$")
+RECITATION_PATTERN = re.compile(r"/chapter_recitations/\d+/(\d+)")
+CHAPTER_AUDIO_PATTERN = re.compile(r"/fixtures/(\d+)\.wav$")
+
+
+def load_verses() -> Dict[str, dict]:
+    """
+    synthetic `verses/by_key` responses, by verse key: the shape of the api
+    with placeholder glyph codes and audio urls of the fixture recitations
+    """
+    with open(VERSES_PATH) as f:
+        return json.load(f)
+
+
+VERSES = load_verses()
+VERSE_KEYS = [
+    VerseKey(chapter_id=int(c), verse_id=int(v))
+    for c, v in (key.split(":") for key in VERSES)
+]
+
+
+def synthetic_samples(segments: List[List[int]], seed: int = 0) -> np.ndarray:
+    """a tone for every word segment over a low noise floor"""
+    rng = np.random.default_rng(seed)
+    frames = verse_duration(segments) * FRAME_RATE // 1000
+
+    samples = rng.normal(0, 30, size=frames)
+    for _, _, begin, end in segments:
+        begin, end = begin * FRAME_RATE // 1000, end * FRAME_RATE // 1000
+        t = np.arange(end - begin) / FRAME_RATE
+        samples[begin:end] += 6000 * np.sin(2 * np.pi * rng.uniform(120, 400) * t)
+
+    return np.clip(samples, -32768, 32767).astype("<i2")
+
+
+def verse_duration(segments: List[List[int]]) -> int:
+    """in milliseconds, the recitation trails off after the last word"""
+    return segments[-1][3] + 400
+
+
+def wav(samples: np.ndarray) -> bytes:
+    buffer = BytesIO()
+    with wave.open(buffer, "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(FRAME_RATE)
+        f.writeframes(samples.tobytes())
+
+    return buffer.getvalue()
+
+
+def chapter_verses(chapter_id: int) -> List[Tuple[str, dict]]:
+    verses = [
+        (key, raw["verse"])
+        for key, raw in VERSES.items()
+        if int(key.split(":")[0]) == chapter_id
+    ]
+    return sorted(verses, key=lambda verse: int(verse[0].split(":")[1]))
+
+
+def chapter_recitation(chapter_id: int) -> dict:
+    """a `chapter_recitations` response, the fixture verses read back to back"""
+    timestamps = []
+    offset = 0
+    for key, verse in chapter_verses(chapter_id):
+        segments = verse["audio"]["segments"]
+        duration = verse_duration(segments)
+        timestamps.append(
+            {
+                "verse_key": key,
+                "timestamp_from": offset,
+                "timestamp_to": offset + duration,
+                "segments": [
+                    [position, begin + offset, end + offset]
+                    for _, position, begin, end in segments
+                ],
+            }
+        )
+        offset += duration
+
+    return {
+        "audio_file": {
+            "chapter_id": chapter_id,
+            "audio_url": f"https://download.quranicaudio.com/fixtures/{chapter_id}.wav",
+            "timestamps": timestamps,
+        }
+    }
+
+
+def fixture(url: str) -> Optional[bytes]:
+    """the body the live endpoint would answer `url` with"""
+    match = VERSE_PATTERN.search(url)
+    if match is not None and match[1] in VERSES:
+        return json.dumps(VERSES[match[1]]).encode()
+
+    match = CHAPTER_PATTERN.search(url)
+    if match is not None:
+        chapter, page, per_page = map(int, match.groups())
+        verses = []
+        for key, raw in VERSES.items():
+            c, v = map(int, key.split(":"))
+            if c == chapter and (page - 1) * per_page < v <= page * per_page:
+                verses.append(raw["verse"])
+        return json.dumps({"verses": verses}).encode()
+
+    match = AUDIO_PATTERN.search(url)
+    if match is not None and f"{match[1]}:{match[2]}" in VERSES:
+        verse = VERSES[f"{match[1]}:{match[2]}"]["verse"]
+        return wav(synthetic_samples(verse["audio"]["segments"], seed=int(match[2])))
+
+    match = RECITATION_PATTERN.search(url)
+    if match is not None and chapter_verses(int(match[1])):
+        return json.dumps(chapter_recitation(int(match[1]))).encode()
+
+    match = CHAPTER_AUDIO_PATTERN.search(url)
+    if match is not None and chapter_verses(int(match[1])):
+        # the samples of the verse files, back to back
+        samples = [
+            synthetic_samples(verse["audio"]["segments"], seed=int(key.split(":")[1]))
+            for key, verse in chapter_verses(int(match[1]))
+        ]
+        return wav(np.concatenate(samples))
+
+    if url.endswith(".ttf"):
+        with open(FONT_PATH, "rb") as f:
+            return f.read()
+
+    return None
+
+
+def GET(url: str, **kwargs) -> Response:
+    """local stand-in of `utilities.GET`, serves the fixtures"""
+    response = Response()
+    response.url = url
+    response._content = fixture(url)
+    response._content_consumed = True
+    response.status_code = 200 if response._content is not None else 404
+
+    response.raise_for_status()
+    return response
+
+
+def install(directory: Optional[str] = None):
+    """answer every request from the fixtures, cached in a fresh directory"""
+    utilities.GET = GET
+    return utilities.configure_cache(directory or tempfile.mkdtemp())
@@ -0,0 +1,69 @@
+from typing import List, Set
+import random
+
+from ..verse.types import VerseWord
+from ..verse.utilities import group_words
+from . import measure, report
+
+
+def legacy_group_words(words: List[VerseWord], periods):
+    """the set scan `extract_clips` used before `group_words`"""
+    groups = []
+    words = set(words)
+
+    for index, (begin, end) in enumerate(periods):
+        collection: Set[VerseWord] = set()
+        for word in words:
+            if end >= word.timestamps >= begin:
+                collection.add(word)
+
+        words = words - collection
+
+        collection = sorted(collection, key=lambda x: x.timestamps)
+        if collection:
+            groups.append((index, collection))
+
+    if words:
+        raise RuntimeError(
+            f"Failed to group verse words into clips. {len(words)} words left unorganized."
+        )
+
+    return groups
+
+
+def synthetic_verse(word_count: int, clip_size: int = 6):
+    rng = random.Random(word_count)
+
+    words: List[VerseWord] = []
+    periods = []
+    time = 0
+    for index in range(word_count):
+        length = rng.randint(200, 900)
+        words.append(
+            VerseWord(
+                spell_audio_path="",
+                translation=f"word-{index}",
+                code_page=1,
+                content=f"w{index}",
+                begin=time,
+                end=time + length,
+            )
+        )
+        time += length
+
+        if index % clip_size == clip_size - 1 or index == word_count - 1:
+            periods.append((periods[-1][1] if periods else 0, time))
+
+    return words, periods
+
+
+if __name__ == "__main__":
+    for word_count in [10, 50, 130, 500]:
+        words, periods = synthetic_verse(word_count)
+        assert group_words(words, periods) == legacy_group_words(words, periods)
+
+        legacy = measure(lambda: legacy_group_words(words, periods), number=20)
+        current = measure(lambda: group_words(words, periods), number=20)
+
+        report(f"legacy set scan ({word_count} words)", legacy)
+        report(f"group_words ({word_count} words)", current, baseline=legacy)
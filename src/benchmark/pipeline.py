@@ -0,0 +1,340 @@
+from typing import Any, Dict, List, Tuple
+import tempfile
+import shutil
+import json
+
+from PIL.ImageFont import FreeTypeFont
+import click
+import numpy as np
+
+from ..renderer import Renderer, load_font, OPEN_SANS, clip2image, clips2frames
+from ..renderer import clip2layout, highlight_updates
+from ..renderer.config import TEXT_FILL, TEXT_MAX_WIDTH_RATIO, QURAN_FONT_SIZE
+from ..renderer.fonts import FontRegistry
+from ..renderer.glyphs import blit_text
+from ..renderer.layout import terms2lines
+from ..renderer.pipelined import PIPELINE_STATS
+from ..renderer.transitions import TRANSITION_NAMES, transition_frames
+from ..renderer.utilities import (
+    verse_words_load_fonts,
+    verse_word2terms,
+    time_step2frame_index,
+    active_words,
+)
+from ..verse import verse_info_by_key, extract_clips
+from ..verse.utilities import get_reciter_config
+from ..verse.config import FONT_NAMESPACE
+from ..utilities import virtual_io
+from ..encoder import FFMPEG
+from ..pipeline import render_verse
+from . import fixtures, measure, report
+
+
+RESOLUTIONS = ["270x480", "540x960", "1080x1920"]
+FPS = [24, 30, 60]
+ENCODERS = ["ffmpeg", "concat"]
+
+# the verse rendered and encoded at every resolution and fps
+ENCODED_VERSE = "1:7"
+
+# lock step, then frames built on a producer thread
+PIPELINE_DEPTHS = [0, 4]
+
+RESULTS: List[Dict[str, Any]] = []
+
+
+def record(name: str, ms: float, frames=None, **settings):
+    report(name, ms, frames=frames)
+    RESULTS.append(
+        {
+            "name": name,
+            "ms": round(ms, 3),
+            "frames": frames,
+            "frames_per_second": round(frames / ms * 1000, 3) if frames else None,
+            **settings,
+        }
+    )
+
+
+def parse_resolution(value: str) -> Tuple[int, int]:
+    width, height = map(int, value.lower().split("x"))
+    return width, height
+
+
+def bench_extract_clips(verses):
+    for verse in verses:
+        ms = measure(lambda: extract_clips(verse)[1].close())
+        record(f"extract_clips ({verse.verse_key})", ms, verse=str(verse.verse_key))
+
+
+def bench_layout(renderer: Renderer, verse, clips, resolution: str):
+    max_width = int(renderer.width * TEXT_MAX_WIDTH_RATIO)
+    fonts = verse_words_load_fonts(verse.content, renderer.quran_font_size)
+    terms = verse_word2terms(verse.content, fonts)
+
+    ms = measure(lambda: list(terms2lines(terms, max_width)), number=100)
+    record(f"terms2lines ({resolution})", ms, resolution=resolution)
+
+    # the whole verse as one clip, shrunk to fit the smaller frames
+    whole = clips[0].model_copy(update={"content": verse.content})
+
+    def fitted():
+        renderer.layouts.layouts.clear()
+        return clip2layout(renderer, whole)
+
+    layout = fitted()
+    ms = measure(fitted, number=10)
+    record(
+        f"layout, fitted to {layout.quran_font_size}px ({resolution})",
+        ms,
+        resolution=resolution,
+    )
+
+    ms = measure(lambda: clip2layout(renderer, whole), number=100)
+    record(f"layout, memoized ({resolution})", ms, resolution=resolution)
+
+    ms = measure(lambda: [clip2image(renderer, clip) for clip in clips])
+    record(f"clip2image ({resolution}, per verse)", ms, resolution=resolution)
+
+
+def bench_fonts(verses):
+    """the page fonts of every verse at every resolution, loaded per renderer"""
+    urls = sorted({word.font_url for verse in verses for word in verse.content})
+    sizes = [QURAN_FONT_SIZE // 2, QURAN_FONT_SIZE, QURAN_FONT_SIZE * 2]
+
+    def legacy():
+        for size in sizes:
+            for url in urls:
+                FreeTypeFont(virtual_io(url, namespace=FONT_NAMESPACE), size=size)
+
+    def registry():
+        fonts = FontRegistry()
+        for size in sizes:
+            fonts.preload(urls, size)
+        return fonts
+
+    ms = measure(legacy)
+    record(f"page fonts, copied per load ({len(urls)} pages)", ms)
+    ms = measure(registry)
+    record(f"page fonts, registry cold ({len(urls)} pages)", ms)
+
+    fonts = registry()
+    ms = measure(
+        lambda: [fonts.font(url, QURAN_FONT_SIZE) for url in urls], number=100
+    )
+    record(f"page fonts, registry warm ({len(urls)} pages)", ms)
+
+
+def bench_transitions(renderer: Renderer, clips, resolution: str):
+    images = [clip2image(renderer, clip) for clip in clips]
+
+    def run(transition):
+        frames = 0
+        previous = None
+        for index, (clip, image) in enumerate(zip(clips, images)):
+            duration = int(min(clip.duration / 6, 500))
+            runs = transition_frames(
+                renderer.transitions,
+                transition,
+                image,
+                time_step2frame_index(clip.duration, renderer.fps),
+                time_step2frame_index(duration, renderer.fps),
+                previous=previous,
+                following=index + 1 < len(clips),
+            )
+            frames += sum(repeat for _, repeat in runs)
+            previous = image
+        return frames
+
+    for transition in TRANSITION_NAMES:
+        frames = run(transition)
+        ms = measure(lambda: run(transition))
+        record(
+            f"{transition} ({resolution}@{renderer.fps})",
+            ms,
+            frames=frames,
+            resolution=resolution,
+            fps=renderer.fps,
+        )
+
+
+def bench_clip2frames(renderer: Renderer, clips, resolution: str):
+    def run():
+        return sum(repeat for _, repeat in clips2frames(renderer, clips))
+
+    frames = run()
+    ms = measure(run, repeat=3)
+    record(
+        f"clips2frames ({resolution}@{renderer.fps})",
+        ms,
+        frames=frames,
+        resolution=resolution,
+        fps=renderer.fps,
+    )
+
+
+def bench_highlight(renderer: Renderer, clips, resolution: str):
+    """incremental karaoke frames against drawing every word state in full"""
+    images = [clip2image(renderer, clip) for clip in clips]
+
+    def incremental():
+        for clip, image in zip(clips, images):
+            for update in highlight_updates(renderer, clip, image).values():
+                update()
+
+    def full():
+        for clip in clips:
+            layout = clip2layout(renderer, clip)
+            for word in active_words(clip, renderer.fps).values():
+                canvas = np.zeros((renderer.height, renderer.width, 3), np.uint8)
+                for index, (font, text, x, y) in enumerate(layout.placed):
+                    active = word is not None and index == layout.words[word]
+                    fill = renderer.highlight_fill if active else TEXT_FILL
+                    blit_text(canvas, font, text, x, y, fill)
+
+    def run():
+        return sum(repeat for _, repeat in clips2frames(renderer, clips))
+
+    states = sum(len(active_words(clip, renderer.fps)) for clip in clips)
+    for name, function in [("incremental", incremental), ("full redraw", full)]:
+        ms = measure(function, repeat=3)
+        record(
+            f"highlight states, {name} ({resolution}@{renderer.fps})",
+            ms,
+            frames=states,
+            resolution=resolution,
+            fps=renderer.fps,
+        )
+
+    renderer.highlight = True
+    try:
+        frames = run()
+        ms = measure(run, repeat=3)
+    finally:
+        renderer.highlight = False
+    record(
+        f"clips2frames, highlight ({resolution}@{renderer.fps})",
+        ms,
+        frames=frames,
+        resolution=resolution,
+        fps=renderer.fps,
+    )
+
+
+def bench_encode(renderer: Renderer, verse, clips, encoders, resolution: str):
+    frames = sum(repeat for _, repeat in clips2frames(renderer, clips))
+
+    for encoder in encoders:
+        dist = tempfile.mkdtemp()
+        try:
+            ms = measure(
+                lambda: render_verse(
+                    renderer, verse, dist, encoder=encoder, progress=False
+                ),
+                repeat=1,
+            )
+        finally:
+            shutil.rmtree(dist)
+
+        record(
+            f"{encoder} encode ({resolution}@{renderer.fps}, per verse)",
+            ms,
+            frames=frames,
+            resolution=resolution,
+            fps=renderer.fps,
+            encoder=encoder,
+        )
+
+
+def bench_pipelined(width: int, height: int, fps: int, verse, resolution: str):
+    """highlighted frames piped into ffmpeg, in lock step or from another thread"""
+    baseline = None
+    for depth in PIPELINE_DEPTHS:
+        renderer = Renderer(
+            height=height,
+            width=width,
+            fps=fps,
+            translation_font=load_font(OPEN_SANS, size=20),
+            frame_cache=False,
+            highlight=True,
+            pipeline_depth=depth,
+        )
+        dist = tempfile.mkdtemp()
+        PIPELINE_STATS.reset()
+        try:
+            ms = measure(
+                lambda: render_verse(
+                    renderer, verse, dist, encoder="ffmpeg", progress=False
+                ),
+                repeat=1,
+            )
+        finally:
+            shutil.rmtree(dist)
+
+        name = f"ffmpeg encode, pipeline depth {depth} ({resolution}@{fps})"
+        report(name, ms, baseline=baseline)
+        RESULTS.append(
+            {
+                "name": name,
+                "ms": round(ms, 3),
+                "resolution": resolution,
+                "fps": fps,
+                "pipeline_depth": depth,
+                **PIPELINE_STATS.summary(),
+            }
+        )
+        baseline = baseline or ms
+
+
+@click.command()
+@click.option("--resolution", "resolutions", multiple=True, default=RESOLUTIONS)
+@click.option("--fps", "fps_values", multiple=True, type=int, default=FPS)
+@click.option("--encoder", "encoders", multiple=True, default=ENCODERS)
+@click.option("--verse", default=ENCODED_VERSE, help="verse to encode")
+@click.option("--json", "output", default=None, help="also write the results here")
+def main(resolutions, fps_values, encoders, verse, output):
+    """time every stage of the pipeline against the offline fixtures"""
+    fixtures.install()
+
+    reciter = get_reciter_config("Mahmoud Khalil Al-Husary")
+    verses = [verse_info_by_key(key, reciter) for key in fixtures.VERSE_KEYS]
+    encoded = next(v for v in verses if str(v.verse_key) == verse)
+
+    bench_extract_clips(verses)
+    bench_fonts(verses)
+    clips, audio = extract_clips(encoded)
+    audio.close()
+
+    if shutil.which(FFMPEG) is None:
+        print(f"'{FFMPEG}' not found, skipping the encoders")
+        encoders = []
+
+    translation_font = load_font(OPEN_SANS, size=20)
+    for resolution in resolutions:
+        width, height = parse_resolution(resolution)
+        renderer = Renderer(
+            height=height,
+            width=width,
+            fps=fps_values[0],
+            translation_font=translation_font,
+            frame_cache=False,
+        )
+        bench_layout(renderer, encoded, clips, resolution)
+
+        for fps in fps_values:
+            renderer.fps = fps
+            bench_transitions(renderer, clips, resolution)
+            bench_clip2frames(renderer, clips, resolution)
+            bench_highlight(renderer, clips, resolution)
+            bench_encode(renderer, encoded, clips, encoders, resolution)
+
+        if "ffmpeg" in encoders:
+            bench_pipelined(width, height, fps_values[0], encoded, resolution)
+
+    if output is not None:
+        with open(output, "w") as f:
+            json.dump(RESULTS, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import numpy as np
+from pydub import AudioSegment, silence
+
+from ..verse.audio import segment_samples, audio_dbfs, detect_silence
+from . import measure, report
+
+
+def synthetic_recitation(
+    seconds: float, frame_rate: int = 44100, channels: int = 1, seed: int = 0
+):
+    """tone bursts separated by pauses over a low noise floor"""
+    rng = np.random.default_rng(seed)
+    frames = int(seconds * frame_rate)
+
+    samples = rng.normal(0, 30, size=(frames, channels))
+    position = 0
+    while position < frames:
+        length = int(rng.uniform(0.3, 2.5) * frame_rate)
+        t = np.arange(min(length, frames - position)) / frame_rate
+        tone = 6000 * np.sin(2 * np.pi * rng.uniform(120, 400) * t)
+        samples[position : position + len(t)] += tone[:, None]
+        position += length + int(rng.uniform(0.05, 0.9) * frame_rate)
+
+    samples = np.clip(samples, -32768, 32767).astype(np.int16)
+    return AudioSegment(
+        samples.tobytes(), frame_rate=frame_rate, sample_width=2, channels=channels
+    )
+
+
+def numpy_detect(audio: AudioSegment, threshold: float):
+    samples = segment_samples(audio)
+    return detect_silence(
+        samples,
+        audio.frame_rate,
+        audio.sample_width,
+        min_silence_len=350,
+        silence_thresh=audio_dbfs(samples, audio.sample_width) - threshold,
+    )
+
+
+def pydub_detect(audio: AudioSegment, threshold: float):
+    return silence.detect_silence(
+        audio_segment=audio,
+        min_silence_len=350,
+        silence_thresh=audio.dBFS - threshold,
+    )
+
+
+if __name__ == "__main__":
+    for seconds, frame_rate, channels in [(5, 44100, 1), (20, 22050, 2), (60, 44100, 2)]:
+        audio = synthetic_recitation(seconds, frame_rate, channels)
+        assert numpy_detect(audio, 8) == pydub_detect(audio, 8)
+
+        name = f"{seconds}s {frame_rate}Hz x{channels}"
+        legacy = measure(lambda: pydub_detect(audio, 8), repeat=1)
+        current = measure(lambda: numpy_detect(audio, 8), repeat=3)
+
+        report(f"pydub detect_silence ({name})", legacy)
+        report(f"numpy detect_silence ({name})", current, baseline=legacy)
@@ -0,0 +1,119 @@
+from typing import Dict, List, Optional, Tuple
+import subprocess
+import sys
+import os
+
+import click
+
+from ..verse.config import RECITERS
+from . import measure, report
+
+# never imported before the confirmation of `src.main`
+HEAVY_MODULES = ["numpy", "cv2", "PIL", "pydantic", "pydub", "requests", "tqdm"]
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COMMANDS: Dict[str, Tuple[List[str], Optional[str]]] = {
+    "--help": (["--help"], None),
+    # every prompt answered by an option, the summary declined
+    "declined summary": (
+        [
+            "--verse_key", "1:1..1:7",
+            "--dist", ".",
+            "--fps", "30",
+            "--resolution", "540x1080",
+            "--reciter", next(iter(RECITERS)),
+            "--output", "output.mp4",
+        ],
+        "n\n",
+    ),
+}
+
+
+def run(args: List[str], stdin: Optional[str] = None, importtime: bool = False):
+    flags = ["-X", "importtime"] if importtime else []
+    return subprocess.run(
+        [sys.executable, *flags, "-m", "src.main", *args],
+        input=stdin,
+        capture_output=True,
+        text=True,
+        cwd=ROOT,
+    )
+
+
+def import_times(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """
+    the cumulative import time of `src.main` and of every module it imported,
+    in milliseconds, from the output of `-X importtime`
+    """
+    total = 0.0
+    modules: Dict[str, float] = {}
+    started = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        if not cumulative.strip().isdigit():
+            continue
+
+        # the interpreter startup (site, encodings) comes before the package
+        top_level = not name.startswith("  ")
+        name = name.strip()
+        started = started or name == "src"
+        if not started:
+            continue
+
+        ms = int(cumulative) / 1000
+        modules[name] = ms
+        if top_level:
+            total += ms
+
+    return total, modules
+
+
+@click.command()
+@click.option(
+    "--budget",
+    default=150.0,
+    help="most milliseconds `src.main` may spend importing",
+    type=float,
+)
+@click.option("--repeat", default=5, help="runs of every command", type=int)
+@click.option("--top", default=10, help="heaviest imports listed", type=int)
+def main(budget: float, repeat: int, top: int):
+    """time the startup of the command line, up to its first output"""
+    failed = False
+    for name, (args, stdin) in COMMANDS.items():
+        result = run(args, stdin, importtime=True)
+        if result.returncode != 0:
+            # e.g. an unanswered prompt, the command never got where it is timed
+            failed = True
+            print(f"{name}: exited with {result.returncode}")
+            print(result.stdout[-500:], end="")
+            continue
+        total, modules = import_times(result.stderr)
+
+        heavy = [
+            module
+            for module in modules
+            if module.split(".")[0] in HEAVY_MODULES
+        ]
+        wall = measure(lambda: run(args, stdin), repeat=repeat)
+
+        report(f"{name} (wall)", wall)
+        report(f"{name} (imports)", total)
+        for module, ms in sorted(modules.items(), key=lambda i: -i[1])[:top]:
+            print(f"    {module:<44}{ms:>10.3f} ms")
+
+        if heavy:
+            failed = True
+            print(f"  heavy modules imported: {', '.join(sorted(heavy))}")
+        if total > budget:
+            failed = True
+            print(f"  over the budget of {budget:.0f} ms")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
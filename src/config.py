@@ -0,0 +1,8 @@
+import os
+
+CACHE_DIR = os.environ.get(
+    "VISUAL_TILAWA_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "visual-tilawa"),
+)
+# in bytes
+CACHE_MAX_SIZE = 2 * 1024**3
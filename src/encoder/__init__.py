@@ -0,0 +1,12 @@
+from importlib import import_module
+
+
+def __getattr__(name: str):
+    """
+    the package is filled from `writers` on first use (PEP 562), importing the
+    `config` of a package stays free of numpy, cv2, PIL and the like
+    """
+    if name.startswith("__"):
+        raise AttributeError(name)
+
+    return getattr(import_module(".writers", __name__), name)
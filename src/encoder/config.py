@@ -0,0 +1,28 @@
+FFMPEG = "ffmpeg"
+
+# libx264 settings of `FFmpegWriter`
+DEFAULT_CODEC = "libx264"
+DEFAULT_PRESET = "veryfast"
+DEFAULT_CRF = 23
+
+PRESETS = [
+    "ultrafast",
+    "superfast",
+    "veryfast",
+    "faster",
+    "fast",
+    "medium",
+    "slow",
+    "slower",
+    "veryslow",
+]
+
+# encoders taking the libx264 preset, crf and tune of the profiles
+X264_CODECS = ["libx264"]
+# the constant quality option of other encoders, "-crf" by default
+QUALITY_OPTIONS = {
+    "h264_nvenc": "-cq",
+    "hevc_nvenc": "-cq",
+    "h264_qsv": "-global_quality",
+    "hevc_qsv": "-global_quality",
+}
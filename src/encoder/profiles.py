@@ -0,0 +1,42 @@
+from typing import Any, Dict, Optional
+
+from .config import DEFAULT_CODEC, DEFAULT_PRESET, DEFAULT_CRF, X264_CODECS
+
+# `EncoderProfile` fields by name, plain data the command line lists and
+# summarizes before pydantic is imported
+PROFILE_SETTINGS: Dict[str, Dict[str, Any]] = {
+    "preview": dict(
+        name="preview", preset="ultrafast", crf=30, tune="stillimage", scale=0.5
+    ),
+    "default": dict(name="default"),
+    "final": dict(
+        name="final", preset="slow", crf=18, tune="stillimage", keyframe_interval=250
+    ),
+}
+
+
+def override_profile(settings: Dict[str, Any], **overrides) -> Dict[str, Any]:
+    """
+    `settings` with the overrides that are not None; a codec other than
+    libx264 keeps only the preset, crf and tune given with it
+    """
+    overrides = {name: value for name, value in overrides.items() if value is not None}
+    settings = dict(settings)
+    if overrides.get("codec", settings.get("codec", DEFAULT_CODEC)) not in X264_CODECS:
+        settings.update(preset=None, crf=None, tune=None)
+
+    return {**settings, **overrides}
+
+
+def profile_summary(
+    name: str,
+    codec: str = DEFAULT_CODEC,
+    preset: Optional[str] = DEFAULT_PRESET,
+    crf: Optional[int] = DEFAULT_CRF,
+    bitrate: Optional[str] = None,
+    **_,
+) -> str:
+    quality = f"bitrate: {bitrate}" if bitrate else f"crf: {crf}"
+    if not bitrate and crf is None:
+        quality = "quality: encoder default"
+    return f"{name} ({codec}, preset: {preset or 'encoder default'}, {quality})"
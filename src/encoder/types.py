@@ -0,0 +1,50 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from .config import DEFAULT_CODEC, DEFAULT_PRESET, DEFAULT_CRF, QUALITY_OPTIONS
+from .profiles import profile_summary
+
+
+class EncoderProfile(BaseModel):
+    name: str = "default"
+
+    # any ffmpeg video encoder, e.g. libx264, libx265, h264_nvenc, h264_qsv
+    codec: str = DEFAULT_CODEC
+    preset: Optional[str] = DEFAULT_PRESET
+    # constant quality, ignored when a `bitrate` (e.g. "2M") is given; passed
+    # as the quality option of the codec, see `QUALITY_OPTIONS`
+    crf: Optional[int] = DEFAULT_CRF
+    bitrate: Optional[str] = None
+    pixel_format: str = "yuv420p"
+    # 0 lets the encoder decide
+    threads: int = 0
+    # in frames
+    keyframe_interval: Optional[int] = None
+    tune: Optional[str] = None
+
+    # of the output resolution and font sizes
+    scale: float = 1.0
+    # of `Renderer.video_writer`
+    fourcc: str = "mp4v"
+
+    def video_args(self) -> List[str]:
+        """ffmpeg output arguments of the video stream"""
+        args = ["-c:v", self.codec]
+        if self.preset is not None:
+            args += ["-preset", self.preset]
+        if self.bitrate is not None:
+            args += ["-b:v", self.bitrate]
+        elif self.crf is not None:
+            args += [QUALITY_OPTIONS.get(self.codec, "-crf"), str(self.crf)]
+        if self.tune is not None:
+            args += ["-tune", self.tune]
+        if self.keyframe_interval is not None:
+            args += ["-g", str(self.keyframe_interval)]
+        if self.threads:
+            args += ["-threads", str(self.threads)]
+
+        return args + ["-pix_fmt", self.pixel_format]
+
+    def summary(self) -> str:
+        return profile_summary(**self.model_dump())
@@ -0,0 +1,344 @@
+from typing import Optional, Tuple, List, Any
+from threading import Lock, local
+import subprocess
+import shutil
+import time
+import wave
+import os
+
+import numpy as np
+import cv2
+
+from .config import FFMPEG
+from .types import EncoderProfile
+from .profiles import PROFILE_SETTINGS
+
+
+PROFILES = {
+    name: EncoderProfile(**settings) for name, settings in PROFILE_SETTINGS.items()
+}
+
+
+class EncodeStats:
+    """frames handed to the writers and the seconds spent writing them"""
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.frames = 0
+            self.seconds = 0.0
+
+            # the share of every thread, see `thread_totals`
+            self._local = local()
+
+    def add(self, frames: int, seconds: float):
+        with self._lock:
+            self.frames += frames
+            self.seconds += seconds
+
+        totals = self._local.__dict__
+        totals["frames"] = totals.get("frames", 0) + frames
+        totals["seconds"] = totals.get("seconds", 0.0) + seconds
+
+    def thread_totals(self) -> Tuple[int, float]:
+        """(frames, seconds) written by the calling thread"""
+        totals = self._local.__dict__
+        return totals.get("frames", 0), totals.get("seconds", 0.0)
+
+    def summary(self, fps: int) -> str:
+        if not self.seconds:
+            return "nothing encoded"
+
+        speed = self.frames / self.seconds
+        return (
+            f"{self.frames} frames in {self.seconds:.1f}s, "
+            f"{speed:.1f} frames/s ({speed / fps:.2f}x realtime)"
+        )
+
+
+ENCODE_STATS = EncodeStats()
+
+
+def remove_file(filename: str):
+    """remove `filename` if it exists"""
+    try:
+        os.remove(filename)
+    except FileNotFoundError:
+        pass
+
+
+def audio_input(filename: str, trim: Optional[Tuple[float, float]] = None):
+    """ffmpeg input arguments of `filename`, only (begin, end) seconds of it if given"""
+    if trim is None:
+        return ["-i", filename]
+    return ["-ss", f"{trim[0]:.3f}", "-to", f"{trim[1]:.3f}", "-i", filename]
+
+
+class FFmpegWriter:
+    """`cv2.VideoWriter` look-alike piping raw BGR frames into one ffmpeg process"""
+
+    def __init__(
+        self,
+        filename: str,
+        frame_size: Tuple[int, int],
+        fps: int,
+        audio_filename: Optional[str] = None,
+        profile: EncoderProfile = PROFILES["default"],
+        audio_codec: str = "aac",
+        audio_trim: Optional[Tuple[float, float]] = None,
+    ) -> None:
+        width, height = frame_size
+
+        command = [FFMPEG, "-y", "-loglevel", "error"]
+        command += ["-f", "rawvideo", "-pix_fmt", "bgr24"]
+        command += ["-s", f"{width}x{height}", "-r", str(fps), "-i", "-"]
+        if audio_filename is not None:
+            command += audio_input(audio_filename, audio_trim)
+            command += ["-map", "0:v", "-map", "1:a"]
+        command += profile.video_args()
+        if audio_filename is not None:
+            command += ["-c:a", audio_codec]
+        command += [filename]
+
+        self.filename = filename
+        self.process = subprocess.Popen(command, stdin=subprocess.PIPE)
+
+    def write(self, frame: np.ndarray, repeat: int = 1):
+        # the pipe blocks while ffmpeg is busy, which is the encoding time
+        begin = time.perf_counter()
+        data = np.ascontiguousarray(frame).data
+        for _ in range(repeat):
+            self.process.stdin.write(data)
+        ENCODE_STATS.add(repeat, time.perf_counter() - begin)
+
+    def release(self):
+        begin = time.perf_counter()
+        self.process.stdin.close()
+        returncode = self.process.wait()
+        ENCODE_STATS.add(0, time.perf_counter() - begin)
+
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to encode '{self.filename}'")
+
+    def abort(self):
+        """stop ffmpeg and remove the truncated video"""
+        self.process.kill()
+        try:
+            self.process.stdin.close()
+        except OSError:
+            # a broken pipe, its buffered frames are dropped
+            pass
+        self.process.wait()
+
+        remove_file(self.filename)
+
+
+class ConcatWriter:
+    """
+    stores every run once as an image and lets ffmpeg's concat demuxer hold
+    it for its duration, the output has a variable frame rate
+    """
+
+    def __init__(
+        self,
+        filename: str,
+        fps: int,
+        temp: str,
+        audio_filename: Optional[str] = None,
+        profile: EncoderProfile = PROFILES["default"],
+        audio_codec: str = "aac",
+        audio_trim: Optional[Tuple[float, float]] = None,
+    ) -> None:
+        self.filename = filename
+        self.fps = fps
+        self.temp = temp
+        self.audio_filename = audio_filename
+        self.audio_codec = audio_codec
+        self.audio_trim = audio_trim
+        self.profile = profile
+
+        os.makedirs(self.temp, exist_ok=True)
+        self.lines = ["ffconcat version 1.0"]
+        self.images = 0
+        self.frames = 0
+        self.repeat = 0
+
+    def write(self, frame: np.ndarray, repeat: int = 1):
+        image = f"{self.images}.bmp"
+        cv2.imwrite(os.path.join(self.temp, image), frame)
+        self.images += 1
+
+        self.lines.append(f"file '{image}'")
+        self.lines.append(f"duration {repeat / self.fps:.6f}")
+        self.frames += repeat
+        self.repeat = repeat
+
+    def release(self):
+        if self.images == 0:
+            raise RuntimeError(f"nothing was rendered into '{self.filename}'")
+
+        # the duration of the last entry only counts if it is followed by a file,
+        # which is shown for one more frame
+        self.lines[-1] = f"duration {(self.repeat - 1) / self.fps:.6f}"
+        self.lines.append(f"file '{self.images - 1}.bmp'")
+
+        listing = os.path.join(self.temp, "list.txt")
+        with open(listing, "w") as f:
+            f.write("\n".join(self.lines) + "\n")
+
+        command = [FFMPEG, "-y", "-loglevel", "error"]
+        command += ["-f", "concat", "-safe", "0", "-i", listing]
+        if self.audio_filename is not None:
+            command += audio_input(self.audio_filename, self.audio_trim)
+            command += ["-map", "0:v", "-map", "1:a"]
+        command += ["-fps_mode", "vfr"] + self.profile.video_args()
+        if self.audio_filename is not None:
+            command += ["-c:a", self.audio_codec]
+        command += [self.filename]
+
+        begin = time.perf_counter()
+        returncode = subprocess.call(command)
+        ENCODE_STATS.add(self.frames, time.perf_counter() - begin)
+        shutil.rmtree(self.temp)
+
+        if returncode != 0:
+            raise RuntimeError(f"ffmpeg failed to encode '{self.filename}'")
+
+    def abort(self):
+        """remove the images written so far"""
+        shutil.rmtree(self.temp, ignore_errors=True)
+        remove_file(self.filename)
+
+
+class OpenCVWriter:
+    """run aware wrapper of `cv2.VideoWriter`"""
+
+    def __init__(
+        self, writer: cv2.VideoWriter, filename: Optional[str] = None
+    ) -> None:
+        self.writer = writer
+        self.filename = filename
+
+    def write(self, frame: np.ndarray, repeat: int = 1):
+        begin = time.perf_counter()
+        for _ in range(repeat):
+            self.writer.write(frame)
+        ENCODE_STATS.add(repeat, time.perf_counter() - begin)
+
+    def release(self):
+        self.writer.release()
+
+    def abort(self):
+        self.writer.release()
+        if self.filename is not None:
+            remove_file(self.filename)
+
+
+class SinglePassSession:
+    """encode a whole range into one file, each verse becomes a chapter"""
+
+    def __init__(
+        self,
+        filename: str,
+        frame_size: Tuple[int, int],
+        fps: int,
+        temp: str,
+        profile: EncoderProfile = PROFILES["default"],
+    ) -> None:
+        self.filename = filename
+        self.fps = fps
+        self.temp = temp
+
+        self.video = FFmpegWriter(f"{temp}.mkv", frame_size, fps, profile=profile)
+        self.audio: Optional[wave.Wave_write] = None
+        self.audio_format: Optional[Tuple[int, int, int]] = None
+
+        self.frames = 0
+        self.samples = 0
+        # (title, begin frame, end frame)
+        self.chapters: List[Tuple[str, int, int]] = []
+
+    def write(self, frame: np.ndarray, repeat: int = 1):
+        self.video.write(frame, repeat)
+        self.frames += repeat
+
+    def end_chapter(self, title: str, audio: Any):
+        """close the chapter started by the previous call with its `PCMAudio`"""
+        audio_format = (audio.frame_rate, audio.channels, audio.sample_width)
+        if self.audio is None:
+            self.audio_format = audio_format
+            self.audio = wave.open(f"{self.temp}.wav", "wb")
+            self.audio.setframerate(audio.frame_rate)
+            self.audio.setnchannels(audio.channels)
+            self.audio.setsampwidth(audio.sample_width)
+
+        frame_rate, channels, sample_width = self.audio_format
+        data = audio.samples
+        if audio_format != self.audio_format:
+            # a verse in another format is converted in memory, through pydub
+            segment = audio.segment().set_frame_rate(frame_rate)
+            segment = segment.set_channels(channels).set_sample_width(sample_width)
+            data = np.frombuffer(segment.raw_data, dtype=f"<i{sample_width}")
+            data = data.reshape(-1, channels)
+
+        # pad or trim to the video written so far, so verses never drift apart
+        samples = round(self.frames * frame_rate / self.fps) - self.samples
+        data = np.ascontiguousarray(data[:samples])
+        self.audio.writeframes(data.data)
+        self.audio.writeframes(b"\0" * ((samples - len(data)) * channels * sample_width))
+
+        self.samples += samples
+
+        begin = self.chapters[-1][2] if self.chapters else 0
+        self.chapters.append((title, begin, self.frames))
+
+    def metadata(self):
+        lines = [";FFMETADATA1"]
+        for title, begin, end in self.chapters:
+            lines.append("[CHAPTER]")
+            lines.append(f"TIMEBASE=1/{self.fps}")
+            lines.append(f"START={begin}")
+            lines.append(f"END={end}")
+            lines.append(f"title={title}")
+
+        return "\n".join(lines) + "\n"
+
+    def release(self):
+        if self.audio is None:
+            self.abort()
+            raise RuntimeError(f"nothing was rendered into '{self.filename}'")
+
+        try:
+            self.video.release()
+            self.audio.close()
+
+            with open(f"{self.temp}.txt", "w") as f:
+                f.write(self.metadata())
+
+            # stream copy of the video, only the audio is encoded here
+            command = [FFMPEG, "-y", "-loglevel", "error"]
+            command += ["-i", f"{self.temp}.mkv", "-i", f"{self.temp}.wav"]
+            command += ["-i", f"{self.temp}.txt", "-map", "0:v", "-map", "1:a"]
+            command += ["-map_metadata", "2", "-map_chapters", "2"]
+            command += ["-c:v", "copy", "-c:a", "aac", self.filename]
+
+            returncode = subprocess.call(command)
+        finally:
+            self.audio.close()
+            for extension in ["mkv", "wav", "txt"]:
+                remove_file(f"{self.temp}.{extension}")
+
+        if returncode != 0:
+            remove_file(self.filename)
+            raise RuntimeError(f"ffmpeg failed to mux '{self.filename}'")
+
+    def abort(self):
+        """stop ffmpeg and remove the temporary files"""
+        self.video.abort()
+        if self.audio is not None:
+            self.audio.close()
+        for extension in ["wav", "txt"]:
+            remove_file(f"{self.temp}.{extension}")
@@ -1,257 +1,652 @@
-from typing import List
-import os
-
-import click
-from tqdm import tqdm
-
-from .renderer import Renderer, load_font, OPEN_SANS, clip2frames
-from .verse import verse_info_by_key, extract_clips, get_reciter_config
-from .verse.types import VerseKey
-from .utilities import merge_audio_and_video
-
-
-class VideoResolution:
-    def __init__(self, width: int, height: int):
-        self.height = height
-        self.width = width
-
-    def __str__(self) -> str:
-        return f"{self.width}x{self.height}"
-
-
-class SizeParam(click.ParamType):
-    name = "Size"
-
-    def convert(self, value: str, _a, _b):
-        if isinstance(value, tuple) or isinstance(value, VideoResolution):
-            return value
-
-        width, height = 0, 0
-        try:
-            width, height = map(int, value.split("x"))
-        except ValueError:
-            raise click.BadParameter(
-                "Size must be specified in the format 'WidthxHeight'."
-            )
-
-        if width <= 0 or height <= 0:
-            raise click.BadArgumentUsage("Width and height must be positive integers.")
-        return VideoResolution(width=width, height=height)
-
-
-class VerseKeyRange:
-    def __init__(self, start: VerseKey, end: VerseKey):
-        self.start = start
-        self.end = end
-
-    def __str__(self) -> str:
-        return f"{self.start}..{self.end}"
-
-
-class VerseKeyParam(click.ParamType):
-    name = "VerseKey"
-
-    def convert(self, value: str, _a, _b):
-        if (
-            isinstance(value, tuple)
-            or isinstance(value, VerseKey)
-            or isinstance(value, list)
-        ):
-            return value
-
-        results = []
-
-        try:
-            for part in value.split(","):
-                ranges = part.split("..")
-
-                out = []
-                for part in ranges:
-                    chapter_id, verse_id = map(int, part.split(":"))
-                    k = VerseKey(chapter_id=chapter_id, verse_id=verse_id)
-                    if k.chapter_id <= 0 or k.verse_id <= 0:
-                        raise click.BadArgumentUsage(
-                            f"chapter_id and verse_id must be positive integers. '{k}'"
-                        )
-                    out.append(k)
-
-                if len(out) == 1:
-                    results.extend(out)
-                elif len(out) == 2:
-                    r = VerseKeyRange(start=out[0], end=out[1])
-
-                    if r.start.chapter_id != r.end.chapter_id:
-                        raise click.BadArgumentUsage(f"chapter_id mismatch '{r}'")
-                    if r.start.verse_id >= r.end.verse_id:
-                        raise click.BadArgumentUsage(
-                            f"range must be in ascending order: '{r}'"
-                        )
-                    results.append(r)
-                else:
-                    raise click.BadArgumentUsage(f"Invalid range format. '{part}'")
-        except ValueError:
-            raise click.BadParameter(
-                "verse key must be specified in the format 'chapter_id:verse_id'."
-            )
-
-        if not results:
-            raise click.BadArgumentUsage("no verse keys found")
-
-        return results
-
-
-def verbose_echo(print: bool, msg):
-    if print:
-        click.echo(f"[VERBOSE] {msg}")
-
-
-@click.command()
-@click.pass_context
-@click.option(
-    "--verse_key",
-    default="1:1",
-    help="which verse to render",
-    prompt="Enter the verse key",
-    type=VerseKeyParam(),
-)
-@click.option(
-    "--dist",
-    default="dist",
-    help="where to store the videos",
-    prompt="Enter the output directory",
-    type=click.Path(exists=True),
-)
-@click.option(
-    "--fps",
-    default=30,
-    help="Frames per second of a video.",
-    prompt="Enter the frames per second",
-    type=int,
-)
-@click.option(
-    "--resolution",
-    default="540x1080",
-    help="video resolution",
-    prompt="Enter the video resolution",
-    type=SizeParam(),
-)
-@click.option(
-    "--reciter",
-    type=click.Choice(list(_RECITERS.keys()), case_sensitive=False),
-    prompt="Choose a reciter",
-    help="Select a reciter by name",
-)
-@click.option(
-    "-v/-q",
-    "--verbose/--quiet",
-    default=True,
-    is_flag=True,
-    help="verbose output",
-)
-@click.option(
-    "-y", "--yes",
-    is_flag=True,
-    default=False,
-    help="Automatically confirm and proceed without prompting."
-)
-def App(
-    ctx: click.Context,
-    verse_key: List[VerseKey],
-    dist: str,
-    fps: int,
-    resolution: VideoResolution,
-    reciter: str,   # <-- single reciter
-    verbose: bool,
-    yes: bool,
-):
-    """generate clips by verse"""
-    line_text = "-" * 10
-
-    click.echo("")
-    click.echo(f"{line_text}Summary{line_text}")
-    click.echo(f"key: {'|'.join([str(v) for v in verse_key])}\tdist: {dist}")
-    click.echo(f"resolution: {resolution}\tfps: {fps}")
-    click.echo(f"reciter: {reciter}")
-    click.echo("")
-
-    if not yes and not click.confirm("Do you want to proceed?", default=True):
-        return
-
-    # ✅ only one reciter config now
-    reciter_cfg = get_reciter_config(reciter)
-
-    renderer = Renderer(
-        height=resolution.height,
-        width=resolution.width,
-        translation_font=load_font(OPEN_SANS, size=20),
-        fps=fps,
-    )
-
-
-    TEMP_FILENAME = f"{dist}/TEMP-DO-NOT-TOUCH"
-    videos: List[str] = []
-
-    generation_keys = []
-    for k in verse_key:
-        if isinstance(k, VerseKeyRange):
-            for i in range(k.start.verse_id, k.end.verse_id + 1):
-                generation_keys.append(
-                    VerseKey(chapter_id=k.start.chapter_id, verse_id=i)
-                )
-        else:
-            generation_keys.append(k)
-
-    for key in generation_keys:
-        filename = f"{dist}/{key.chapter_id}-{key.verse_id}.mp4"
-
-        verbose_echo(verbose, f"loading verse[{key}] information...")
-        verse_info = None
-        try:
-            verse_info = verse_info_by_key(key=key, reciter=reciter)
-        except Exception:
-            click.echo(f"[ERROR] key '{key}' not found")
-            if click.confirm(f"ignore '{key}' and continue?", default=False):
-                continue
-            else:
-                click.echo("exiting...")
-                return
-        verbose_echo(verbose, "extracting clips...")
-        clips, audio = extract_clips(verse_info)
-
-        if not clips:
-            raise ValueError(f"no clips found for verse {key}")
-
-        out = renderer.video_writer(f"{TEMP_FILENAME}.mp4")
-
-        for clip in tqdm(clips, "rendering"):
-            for frame in clip2frames(renderer, clip):
-                out.write(frame)
-
-        verbose_echo(verbose, "saving...")
-        audio.export(f"{TEMP_FILENAME}.mp3")
-        out.release()
-
-        merge_audio_and_video(filename, f"{TEMP_FILENAME}.mp3", f"{TEMP_FILENAME}.mp4")
-        videos.append(filename)
-
-        click.echo("\n")
-
-    output_filename = click.prompt(
-        "Enter output video path",
-        default="release.mp4",
-        type=click.Path(exists=False),
-    )
-
-    fname = "temp-vagerwdlt.txt"
-    with open(fname, "w") as f:
-        f.writelines([f"file '{f}'\n" for f in videos])
-    os.system(
-        f"ffmpeg -f concat -i {fname} -c copy -loglevel error -y {output_filename}"
-    )
-    os.remove(fname)
-
-
-if __name__ == "__main__":
-    App()
-
-
+from typing import List, Optional, Tuple
+
+import click
+
+# only light modules up to the confirmation, the renderer, encoders and
+# downloads (cv2, numpy, PIL, pydantic, requests) are imported in `App`
+from .config import CACHE_DIR
+from .profiling import PROFILER
+from .verse.config import RECITERS
+from .encoder.config import PRESETS
+from .encoder.profiles import PROFILE_SETTINGS, override_profile, profile_summary
+from .renderer.config import TRANSITION_NAMES, PIPELINE_DEPTH
+
+
+class VideoResolution:
+    def __init__(self, width: int, height: int):
+        self.height = height
+        self.width = width
+
+    def __str__(self) -> str:
+        return f"{self.width}x{self.height}"
+
+
+class SizeParam(click.ParamType):
+    name = "Size"
+
+    def convert(self, value: str, _a, _b):
+        if isinstance(value, tuple) or isinstance(value, VideoResolution):
+            return value
+
+        width, height = 0, 0
+        try:
+            width, height = map(int, value.split("x"))
+        except ValueError:
+            raise click.BadParameter(
+                "Size must be specified in the format 'WidthxHeight'."
+            )
+
+        if width <= 0 or height <= 0:
+            raise click.BadArgumentUsage("Width and height must be positive integers.")
+        return VideoResolution(width=width, height=height)
+
+
+class VerseKeyRange:
+    """(chapter_id, verse_id) keys from `start` to `end`, a single key if equal"""
+
+    def __init__(self, start: Tuple[int, int], end: Tuple[int, int]):
+        self.start = start
+        self.end = end
+
+    def __str__(self) -> str:
+        start = "%d:%d" % self.start
+        return start if self.start == self.end else f"{start}..%d:%d" % self.end
+
+
+class VerseKeyParam(click.ParamType):
+    name = "VerseKey"
+
+    def convert(self, value: str, _a, _b):
+        if isinstance(value, list):
+            return value
+
+        results = []
+
+        try:
+            for part in value.split(","):
+                ranges = part.split("..")
+
+                out = []
+                for part in ranges:
+                    chapter_id, verse_id = map(int, part.split(":"))
+                    if chapter_id <= 0 or verse_id <= 0:
+                        raise click.BadArgumentUsage(
+                            "chapter_id and verse_id must be positive integers. "
+                            f"'{chapter_id}:{verse_id}'"
+                        )
+                    out.append((chapter_id, verse_id))
+
+                if len(out) == 1:
+                    results.append(VerseKeyRange(start=out[0], end=out[0]))
+                elif len(out) == 2:
+                    r = VerseKeyRange(start=out[0], end=out[1])
+
+                    if r.start[0] != r.end[0]:
+                        raise click.BadArgumentUsage(f"chapter_id mismatch '{r}'")
+                    if r.start[1] >= r.end[1]:
+                        raise click.BadArgumentUsage(
+                            f"range must be in ascending order: '{r}'"
+                        )
+                    results.append(r)
+                else:
+                    raise click.BadArgumentUsage(f"Invalid range format. '{part}'")
+        except ValueError:
+            raise click.BadParameter(
+                "verse key must be specified in the format 'chapter_id:verse_id'."
+            )
+
+        if not results:
+            raise click.BadArgumentUsage("no verse keys found")
+
+        return results
+
+
+def expand_keys(
+    verse_key: List[VerseKeyRange], reciter, verbose: bool = False, lang: str = "en"
+):
+    """every `VerseKey` of the ranges in `verse_key`, with their verses loaded"""
+    from .verse import verses_info_by_range
+    from .verse.types import VerseKey
+    from .pipeline import verbose_echo
+
+    keys = []
+    for k in verse_key:
+        chapter_id = k.start[0]
+        if k.start != k.end:
+            # a few paginated requests instead of one per verse, missing
+            # verses are requested (and reported) one by one later on
+            verbose_echo(verbose, f"loading range[{k}] information...")
+            try:
+                with PROFILER.stage("verse_range"):
+                    verses_info_by_range(
+                        VerseKey(chapter_id=chapter_id, verse_id=k.start[1]),
+                        VerseKey(chapter_id=chapter_id, verse_id=k.end[1]),
+                        reciter=reciter,
+                        lang=lang,
+                    )
+            except Exception as e:
+                verbose_echo(verbose, f"range[{k}] failed: {e}")
+
+        for i in range(k.start[1], k.end[1] + 1):
+            keys.append(VerseKey(chapter_id=chapter_id, verse_id=i))
+
+    return keys
+
+
+@click.command()
+@click.pass_context
+@click.option(
+    "--verse_key",
+    default="1:1",
+    help="which verse to render",
+    prompt="Enter the verse key",
+    type=VerseKeyParam(),
+)
+@click.option(
+    "--dist",
+    default="dist",
+    help="where to store the videos",
+    prompt="Enter the output directory",
+    type=click.Path(exists=True),
+)
+@click.option(
+    "--fps",
+    default=30,
+    help="Frames per second of a video.",
+    prompt="Enter the frames per second",
+    type=int,
+)
+@click.option(
+    "--resolution",
+    default="540x1080",
+    help="video resolution",
+    prompt="Enter the video resolution",
+    type=SizeParam(),
+)
+@click.option(
+    "--reciter",
+    type=click.Choice(list(RECITERS), case_sensitive=False),
+    prompt="Choose a reciter",
+    help="Select a reciter by name",
+)
+@click.option(
+    "-v/-q",
+    "--verbose/--quiet",
+    default=True,
+    is_flag=True,
+    help="verbose output",
+)
+@click.option(
+    "-y", "--yes",
+    is_flag=True,
+    default=False,
+    help="Automatically confirm and proceed without prompting."
+)
+@click.option(
+    "--cache_dir",
+    default=CACHE_DIR,
+    help="where to cache downloaded verses, recitations and fonts",
+    type=click.Path(file_okay=False),
+)
+@click.option(
+    "--cache_size",
+    default=2048,
+    help="maximum size of the download cache in megabytes",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    help="never touch the network, only use cached downloads",
+)
+@click.option(
+    "--font_dir",
+    default=None,
+    help="directory of local page fonts (p1.ttf, ...) used instead of downloads",
+    type=click.Path(exists=True, file_okay=False),
+)
+@click.option(
+    "--frame_cache/--no-frame_cache",
+    default=True,
+    help="reuse rendered clip images from previous runs",
+)
+@click.option(
+    "--pipeline_depth",
+    default=PIPELINE_DEPTH,
+    help="frames built on another thread ahead of the encoder, 0 for none",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--transition",
+    default="fade",
+    help="how clips enter and leave the frame",
+    type=click.Choice(TRANSITION_NAMES),
+)
+@click.option(
+    "--highlight/--no-highlight",
+    default=False,
+    help="highlight every word while it is recited",
+)
+@click.option(
+    "-j",
+    "--jobs",
+    default=1,
+    help="how many verses to render in parallel",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--resume/--no-resume",
+    default=True,
+    help="skip verses whose videos in dist are up to date with their inputs",
+)
+@click.option(
+    "--stop_on_error",
+    is_flag=True,
+    default=False,
+    help="exit at the first failed verse instead of moving on to the next",
+)
+@click.option(
+    "--prefetch/--no-prefetch",
+    default=True,
+    help="download upcoming verses in the background while rendering",
+)
+@click.option(
+    "--encoder",
+    default="ffmpeg",
+    help="pipe frames into ffmpeg, hand it still runs with durations (concat) "
+    "or write them with OpenCV and re-encode",
+    type=click.Choice(["ffmpeg", "concat", "opencv"]),
+)
+@click.option(
+    "--encode_profile",
+    default="default",
+    help="encoder settings to start from, the options below override them",
+    type=click.Choice(list(PROFILE_SETTINGS)),
+)
+@click.option(
+    "--codec",
+    default=None,
+    help="ffmpeg video encoder, e.g. libx264, libx265, h264_nvenc or h264_qsv",
+)
+@click.option(
+    "--preset",
+    default=None,
+    help=f"encoder preset, libx264 has {', '.join(PRESETS)}",
+)
+@click.option(
+    "--crf",
+    default=None,
+    help="constant quality of the encoder, -crf (-cq of nvenc, -global_quality of qsv)",
+    type=click.IntRange(min=0, max=51),
+)
+@click.option(
+    "--bitrate",
+    default=None,
+    help="target video bitrate (e.g. 2M) instead of a constant rate factor",
+)
+@click.option(
+    "--threads",
+    default=None,
+    help="encoder threads, 0 lets the encoder decide",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--keyframe_interval",
+    default=None,
+    help="maximum frames between keyframes",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--tune",
+    default=None,
+    help="encoder tuning, e.g. stillimage",
+)
+@click.option(
+    "--output",
+    default="release.mp4",
+    help="where to store the final video",
+    prompt="Enter output video path",
+    type=click.Path(exists=False),
+)
+@click.option(
+    "--single_pass",
+    is_flag=True,
+    default=False,
+    help="encode the whole range in one session, with a chapter per verse",
+)
+@click.option(
+    "--verse_files/--no-verse_files",
+    default=False,
+    help="with --single_pass, also write a video per verse",
+)
+@click.option(
+    "--chapter_audio/--no-chapter_audio",
+    default=False,
+    help="download and decode one recitation per chapter, gapless across verses",
+)
+@click.option(
+    "--profile",
+    default=None,
+    help="write per stage timings and frame rates to this JSON report",
+    type=click.Path(exists=False),
+)
+@click.option(
+    "--trace",
+    default=None,
+    help="with --profile, also write a chrome://tracing file of the stages",
+    type=click.Path(exists=False),
+)
+def App(
+    ctx: click.Context,
+    verse_key: List[VerseKeyRange],
+    dist: str,
+    fps: int,
+    resolution: VideoResolution,
+    reciter: str,   # <-- single reciter
+    verbose: bool,
+    yes: bool,
+    cache_dir: str,
+    cache_size: int,
+    offline: bool,
+    font_dir: Optional[str],
+    frame_cache: bool,
+    pipeline_depth: int,
+    transition: str,
+    highlight: bool,
+    jobs: int,
+    resume: bool,
+    stop_on_error: bool,
+    prefetch: bool,
+    encoder: str,
+    encode_profile: str,
+    codec: Optional[str],
+    preset: Optional[str],
+    crf: Optional[int],
+    bitrate: Optional[str],
+    threads: Optional[int],
+    keyframe_interval: Optional[int],
+    tune: Optional[str],
+    output: str,
+    single_pass: bool,
+    verse_files: bool,
+    chapter_audio: bool,
+    profile: str,
+    trace: str,
+):
+    """generate clips by verse"""
+    if single_pass and (jobs > 1 or encoder != "ffmpeg"):
+        raise click.UsageError("--single_pass needs --jobs 1 and --encoder ffmpeg")
+
+    profile_settings = override_profile(
+        PROFILE_SETTINGS[encode_profile],
+        codec=codec,
+        preset=preset,
+        crf=crf,
+        bitrate=bitrate,
+        threads=threads,
+        keyframe_interval=keyframe_interval,
+        tune=tune,
+    )
+
+    line_text = "-" * 10
+
+    click.echo("")
+    click.echo(f"{line_text}Summary{line_text}")
+    click.echo(f"key: {'|'.join([str(v) for v in verse_key])}\tdist: {dist}")
+    click.echo(f"output: {output}\tsingle pass: {single_pass}")
+    click.echo(f"resolution: {resolution}\tfps: {fps}\tjobs: {jobs}")
+    click.echo(f"reciter: {reciter}")
+    click.echo(f"encoder: {encoder}\tprofile: {profile_summary(**profile_settings)}")
+    click.echo(f"cache: {cache_dir}\toffline: {offline}")
+    if font_dir is not None:
+        click.echo(f"fonts: {font_dir}")
+    click.echo(f"chapter audio: {chapter_audio}\thighlight: {highlight}")
+    click.echo("")
+
+    if not yes and not click.confirm("Do you want to proceed?", default=True):
+        return
+
+    from .verse import get_reciter_config, prefetch_verses, release_decoded_audio
+    from .verse.types import VerseKey
+    from .utilities import CACHE, PREFETCHER, concat_videos
+    from .encoder import EncoderProfile, ENCODE_STATS, SinglePassSession
+    from .renderer.pipelined import PIPELINE_STATS
+    from .manifest import Manifest
+    from .pipeline import (
+        RenderSettings,
+        load_verse,
+        render_verse,
+        render_parallel,
+        append_verse,
+        verbose_echo,
+        verse_inputs,
+    )
+
+    profile_cfg = EncoderProfile(**profile_settings)
+
+    if profile is not None:
+        PROFILER.enable()
+
+    # ✅ only one reciter config now
+    reciter_cfg = get_reciter_config(reciter)
+
+    settings = RenderSettings(
+        dist=dist,
+        height=resolution.height,
+        width=resolution.width,
+        fps=fps,
+        reciter=reciter_cfg,
+        frame_cache=frame_cache,
+        pipeline_depth=pipeline_depth,
+        transition=transition,
+        highlight=highlight,
+        encoder=encoder,
+        encode_profile=profile_cfg,
+        cache_dir=cache_dir,
+        cache_size=cache_size * 1024**2,
+        offline=offline,
+        font_dir=font_dir,
+        profile=profile is not None,
+        chapter_audio=chapter_audio,
+    )
+    settings.configure_cache()
+
+    videos: List[str] = []
+
+    generation_keys = expand_keys(verse_key, reciter_cfg, verbose)
+
+    if prefetch:
+        prefetch_verses(generation_keys, reciter_cfg, chapter_audio=chapter_audio)
+
+    # per verse outputs only, a single pass always encodes the whole range
+    manifest = None if single_pass else Manifest.load(dist)
+    failures = 0
+
+    def failed(key: VerseKey, inputs, error: str):
+        nonlocal failures
+        failures += 1
+        click.echo(f"[ERROR] {error}")
+        if manifest is not None:
+            manifest.failed(str(key), inputs, error)
+            manifest.save(dist)
+
+    def plan(key: VerseKey):
+        """the verse and its input hashes, None when its video is up to date"""
+        with PROFILER.stage("verse_info"):
+            verse_info = load_verse(key, reciter_cfg, chapter_audio)
+        if manifest is None:
+            return verse_info, {}
+
+        inputs = verse_inputs(settings, verse_info)
+        if resume and manifest.up_to_date(str(key), inputs):
+            click.echo(f"[SKIP] '{key}' is up to date")
+            return None, inputs
+
+        return verse_info, inputs
+
+    try:
+        # the single pass video could not be written
+        unfinished = False
+        if jobs > 1:
+            stale, inputs, outputs = [], {}, {}
+            for key in generation_keys:
+                try:
+                    verse_info, inputs[str(key)] = plan(key)
+                except Exception as e:
+                    failed(key, {}, f"could not load key '{key}': {e}")
+                    if stop_on_error:
+                        break
+                    continue
+                if verse_info is None:
+                    outputs[str(key)] = manifest.verses[str(key)].filename
+                else:
+                    stale.append(key)
+            else:
+                verbose_echo(verbose, f"rendering {len(stale)} verses...")
+                results = render_parallel(settings, stale, jobs)
+
+                for key, (filename, error, state, stats) in zip(stale, results):
+                    PROFILER.merge(state)
+                    ENCODE_STATS.add(*stats)
+                    if error is not None:
+                        failed(key, inputs[str(key)], error)
+                        continue
+
+                    outputs[str(key)] = filename
+                    manifest.done(str(key), inputs[str(key)], filename)
+                    manifest.save(dist)
+
+            # in the order of the keys, skipped verses included
+            videos = [
+                outputs[str(key)] for key in generation_keys if str(key) in outputs
+            ]
+        else:
+            renderer = settings.renderer()
+
+            session = None
+            if single_pass:
+                session = SinglePassSession(
+                    output,
+                    renderer.frame_size,
+                    fps,
+                    temp=f"{dist}/TEMP-DO-NOT-TOUCH",
+                    profile=profile_cfg,
+                )
+
+            try:
+                for key in generation_keys:
+                    if stop_on_error and failures:
+                        break
+
+                    with PROFILER.verse(str(key)):
+                        verbose_echo(verbose, f"loading verse[{key}] information...")
+                        try:
+                            verse_info, inputs = plan(key)
+                        except Exception as e:
+                            failed(key, {}, f"could not load key '{key}': {e}")
+                            continue
+                        if verse_info is None:
+                            videos.append(manifest.verses[str(key)].filename)
+                            continue
+
+                        if session is not None:
+                            written = session.frames
+                            try:
+                                append_verse(
+                                    session,
+                                    renderer,
+                                    verse_info,
+                                    dist,
+                                    verse_files=verse_files,
+                                    profile=profile_cfg,
+                                    verbose=verbose,
+                                )
+                            except Exception as e:
+                                failed(key, inputs, f"key '{key}' failed: {e}")
+                                if session.frames == written:
+                                    continue
+                                # a half written verse breaks the whole video
+                                click.echo("[ERROR] the single pass video is broken")
+                                session.abort()
+                                session = None
+                                unfinished = True
+                                break
+                            click.echo("\n")
+                            continue
+
+                        try:
+                            filename = render_verse(
+                                renderer,
+                                verse_info,
+                                dist,
+                                encoder=encoder,
+                                profile=profile_cfg,
+                                verbose=verbose,
+                            )
+                        except Exception as e:
+                            failed(key, inputs, f"key '{key}' failed: {e}")
+                            continue
+
+                        videos.append(filename)
+                        manifest.done(str(key), inputs, filename)
+                        manifest.save(dist)
+
+                        click.echo("\n")
+            except BaseException:
+                # e.g. ctrl-c, no ffmpeg or temporary files are left behind
+                if session is not None:
+                    session.abort()
+                raise
+
+            if session is not None:
+                verbose_echo(verbose, "muxing...")
+                try:
+                    with PROFILER.stage("mux"):
+                        session.release()
+                except RuntimeError as e:
+                    click.echo(f"[ERROR] {e}")
+                    unfinished = True
+    finally:
+        # queued prefetches of the range would hold the interpreter open
+        PREFETCHER.close()
+        release_decoded_audio()
+
+    verbose_echo(verbose, f"cache: {CACHE.hits} hits, {CACHE.misses} misses")
+    verbose_echo(verbose, f"pipeline: {PIPELINE_STATS.summary()}")
+    click.echo(f"encode speed: {ENCODE_STATS.summary(fps)}")
+
+    if not single_pass and videos:
+        with PROFILER.stage("concat"):
+            try:
+                concat_videos(output, videos)
+            except RuntimeError as e:
+                raise click.ClickException(str(e))
+
+    if profile is not None:
+        PROFILER.count("cache_hits", CACHE.hits)
+        PROFILER.count("cache_misses", CACHE.misses)
+        PROFILER.count("encoded_frames", ENCODE_STATS.frames)
+        PROFILER.count("encode_seconds", ENCODE_STATS.seconds)
+        PROFILER.count("producer_stall_seconds", PIPELINE_STATS.producer_stall)
+        PROFILER.count("consumer_stall_seconds", PIPELINE_STATS.consumer_stall)
+        PROFILER.save(
+            profile,
+            trace=trace,
+            keys=[str(key) for key in generation_keys],
+            jobs=jobs,
+            single_pass=single_pass,
+            **settings.model_dump(mode="json", exclude={"profile"}),
+        )
+        verbose_echo(verbose, f"profile saved to {profile}")
+
+    if failures:
+        click.echo(f"[ERROR] {failures} verses failed, rerun to retry them")
+    if failures or unfinished:
+        ctx.exit(1)
+
+
+if __name__ == "__main__":
+    App()
+
+
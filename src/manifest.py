@@ -0,0 +1,80 @@
+from typing import Dict, Literal, Optional
+import time
+import os
+
+from pydantic import BaseModel
+
+
+MANIFEST_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+VerseStatus = Literal["done", "failed"]
+
+
+class VerseRecord(BaseModel):
+    status: VerseStatus
+
+    # input name (metadata, audio, fonts, settings): sha256
+    inputs: Dict[str, str]
+
+    filename: Optional[str] = None
+    # in bytes, a truncated or replaced output is rendered again
+    size: Optional[int] = None
+    error: Optional[str] = None
+
+    # unix time
+    updated: float
+
+
+class Manifest(BaseModel):
+    """what every verse of `dist` was rendered from, saved after each verse"""
+
+    version: int = MANIFEST_VERSION
+    verses: Dict[str, VerseRecord] = {}
+
+    @staticmethod
+    def filename(dist: str) -> str:
+        return os.path.join(dist, MANIFEST_NAME)
+
+    @classmethod
+    def load(cls, dist: str) -> "Manifest":
+        """the manifest of `dist`, an empty one when missing or outdated"""
+        try:
+            with open(cls.filename(dist)) as f:
+                manifest = cls.model_validate_json(f.read())
+        except (OSError, ValueError):
+            return cls()
+
+        return manifest if manifest.version == MANIFEST_VERSION else cls()
+
+    def save(self, dist: str):
+        filename = self.filename(dist)
+        temp = f"{filename}.{os.getpid()}.tmp"
+        with open(temp, "w") as f:
+            f.write(self.model_dump_json(indent=2))
+        # never leaves a half written manifest behind
+        os.replace(temp, filename)
+
+    def up_to_date(self, key: str, inputs: Dict[str, str]) -> bool:
+        record = self.verses.get(key)
+        if record is None or record.status != "done" or record.inputs != inputs:
+            return False
+
+        try:
+            return os.path.getsize(record.filename) == record.size
+        except OSError:
+            return False
+
+    def done(self, key: str, inputs: Dict[str, str], filename: str):
+        self.verses[key] = VerseRecord(
+            status="done",
+            inputs=inputs,
+            filename=filename,
+            size=os.path.getsize(filename),
+            updated=time.time(),
+        )
+
+    def failed(self, key: str, inputs: Dict[str, str], error: str):
+        self.verses[key] = VerseRecord(
+            status="failed", inputs=inputs, error=error, updated=time.time()
+        )
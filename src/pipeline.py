@@ -0,0 +1,397 @@
+from typing import List, Optional, Literal
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.util import Finalize
+from hashlib import sha256
+import json
+import os
+
+import click
+from pydantic import BaseModel
+from tqdm import tqdm
+
+from .renderer import Renderer, load_font, OPEN_SANS, pipelined_clips2frames
+from .renderer import preload_verse_fonts
+from .renderer.fonts import FONTS, configure_fonts
+from .renderer.config import QURAN_FONT_SIZE, TRANSLATION_FONT_SIZE
+from .renderer.config import FRAME_CACHE_VERSION, PIPELINE_DEPTH
+from .renderer.transitions import TransitionName
+from .verse import verse_info_by_key, extract_clips
+from .verse import chapter_recitation, with_chapter_audio, release_decoded_audio
+from .verse.audio import PCMAudio
+from .verse.types import VerseKey, VerseInformation, Reciter, TranslationLanguage
+from .verse.types import ClipInformation
+from .verse.utilities import audio_namespace
+from .utilities import merge_audio_and_video, configure_cache, fetch_file, file_digest
+from .profiling import PROFILER
+from .encoder import (
+    FFmpegWriter,
+    ConcatWriter,
+    OpenCVWriter,
+    SinglePassSession,
+    EncoderProfile,
+    PROFILES,
+    ENCODE_STATS,
+)
+
+Encoder = Literal["ffmpeg", "concat", "opencv"]
+
+
+def verbose_echo(print: bool, msg):
+    if print:
+        click.echo(f"[VERBOSE] {msg}")
+
+
+class RenderSettings(BaseModel):
+    dist: str
+    height: int
+    width: int
+    fps: int
+
+    reciter: Reciter
+
+    frame_cache: bool = True
+    # frame runs built ahead of the encoder, 0 for none
+    pipeline_depth: int = PIPELINE_DEPTH
+    transition: TransitionName = "fade"
+    highlight: bool = False
+
+    encoder: Encoder = "ffmpeg"
+    encode_profile: EncoderProfile = PROFILES["default"]
+
+    cache_dir: str
+    # in bytes
+    cache_size: int
+    offline: bool = False
+    # local page fonts (p1.ttf, ...) used instead of downloads
+    font_dir: Optional[str] = None
+
+    profile: bool = False
+    chapter_audio: bool = False
+
+    def configure_cache(self):
+        configure_fonts(self.font_dir)
+        return configure_cache(
+            directory=self.cache_dir, max_size=self.cache_size, offline=self.offline
+        )
+
+    def renderer(self) -> Renderer:
+        scale = self.encode_profile.scale
+        return Renderer(
+            height=even(self.height * scale),
+            width=even(self.width * scale),
+            translation_font=load_font(
+                OPEN_SANS, size=round(TRANSLATION_FONT_SIZE * scale)
+            ),
+            quran_font_size=round(QURAN_FONT_SIZE * scale),
+            fps=self.fps,
+            frame_cache=self.frame_cache,
+            pipeline_depth=self.pipeline_depth,
+            transition=self.transition,
+            highlight=self.highlight,
+        )
+
+
+def even(size: float) -> int:
+    """yuv420p needs even frame sizes"""
+    return max(2, 2 * round(size / 2))
+
+
+def load_verse(
+    key: VerseKey,
+    reciter: Reciter,
+    chapter_audio: bool = False,
+    lang: TranslationLanguage = "en",
+):
+    verse_info = verse_info_by_key(key=key, reciter=reciter, lang=lang)
+    if chapter_audio:
+        recitation = chapter_recitation(key.chapter_id, reciter)
+        verse_info = with_chapter_audio(verse_info, recitation)
+
+    return verse_info
+
+
+# the settings an output file depends on, unlike e.g. `cache_dir`
+OUTPUT_SETTINGS = {
+    "height",
+    "width",
+    "fps",
+    "transition",
+    "highlight",
+    "encoder",
+    "encode_profile",
+    "chapter_audio",
+}
+
+
+def digest(data) -> str:
+    return sha256(json.dumps(data, sort_keys=True).encode()).hexdigest()
+
+
+def verse_inputs(settings: RenderSettings, verse_info: VerseInformation):
+    """sha256 of everything the output of `verse_info` is rendered from"""
+    audio = fetch_file(
+        verse_info.audio_url, namespace=audio_namespace(verse_info.reciter)
+    )
+    fonts = sorted({w.font_url for w in verse_info.content} | {OPEN_SANS})
+
+    return {
+        "metadata": digest(verse_info.model_dump(mode="json")),
+        "audio": file_digest(audio),
+        "fonts": digest(
+            [file_digest(FONTS.path(url)) for url in fonts]
+        ),
+        "settings": digest(
+            [
+                FRAME_CACHE_VERSION,
+                settings.model_dump(mode="json", include=OUTPUT_SETTINGS),
+            ]
+        ),
+    }
+
+
+def audio_options(audio: PCMAudio):
+    """writer arguments muxing `audio`, a whole compressed file is stream copied"""
+    if audio.span is None and audio.compressed:
+        return dict(audio_filename=audio.source, audio_codec="copy")
+    if audio.span is None:
+        return dict(audio_filename=audio.source, audio_codec="aac")
+
+    begin, end = audio.span
+    return dict(
+        audio_filename=audio.source,
+        audio_codec="aac",
+        audio_trim=(begin / 1000, end / 1000),
+    )
+
+
+def verse_filename(dist: str, key: VerseKey):
+    return f"{dist}/{key.chapter_id}-{key.verse_id}.mp4"
+
+
+def temp_filename(dist: str, key: VerseKey):
+    return f"{dist}/TEMP-DO-NOT-TOUCH-{key.chapter_id}-{key.verse_id}"
+
+
+def render_verse(
+    renderer: Renderer,
+    verse_info: VerseInformation,
+    dist: str,
+    encoder: Encoder = "ffmpeg",
+    profile: EncoderProfile = PROFILES["default"],
+    verbose: bool = False,
+    progress: bool = True,
+):
+    verbose_echo(verbose, "extracting clips...")
+    with PROFILER.stage("extract_clips"):
+        clips, audio = extract_clips(verse_info)
+
+    try:
+        return render_clips(
+            renderer,
+            verse_info,
+            clips,
+            audio,
+            dist,
+            encoder=encoder,
+            profile=profile,
+            verbose=verbose,
+            progress=progress,
+        )
+    finally:
+        audio.close()
+
+
+def render_clips(
+    renderer: Renderer,
+    verse_info: VerseInformation,
+    clips: List[ClipInformation],
+    audio: PCMAudio,
+    dist: str,
+    encoder: Encoder = "ffmpeg",
+    profile: EncoderProfile = PROFILES["default"],
+    verbose: bool = False,
+    progress: bool = True,
+):
+    """the video of `verse_info` from its extracted clips, `audio` is left open"""
+    key = verse_info.verse_key
+    if not clips:
+        raise ValueError(f"no clips found for verse {key}")
+
+    with PROFILER.stage("fonts"):
+        preload_verse_fonts(renderer, [verse_info])
+
+    temp = temp_filename(dist, key)
+    filename = verse_filename(dist, key)
+
+    if encoder == "ffmpeg":
+        # the frames are encoded and muxed with the untouched audio in one pass
+        out = FFmpegWriter(
+            filename,
+            renderer.frame_size,
+            renderer.fps,
+            profile=profile,
+            **audio_options(audio),
+        )
+    elif encoder == "concat":
+        # still runs are stored once and given a duration instead
+        out = ConcatWriter(
+            filename,
+            renderer.fps,
+            temp=temp,
+            profile=profile,
+            **audio_options(audio),
+        )
+    else:
+        out = OpenCVWriter(
+            renderer.video_writer(f"{temp}.mp4", profile.fourcc), f"{temp}.mp4"
+        )
+
+    clips = tqdm(clips, "rendering", disable=not progress)
+    try:
+        with PROFILER.stage("render"):
+            for frame, repeat in pipelined_clips2frames(renderer, clips):
+                with PROFILER.stage("encode", trace=False):
+                    out.write(frame, repeat)
+                PROFILER.count("frames", repeat)
+    except BaseException:
+        # no encoder process, temporary images or partial video is left behind
+        out.abort()
+        raise
+
+    verbose_echo(verbose, "saving...")
+    with PROFILER.stage("mux"):
+        out.release()
+        if encoder == "opencv":
+            try:
+                merge_audio_and_video(
+                    filename,
+                    audio.source,
+                    f"{temp}.mp4",
+                    audio_trim=audio_options(audio).get("audio_trim"),
+                    video_args=profile.video_args(),
+                )
+            finally:
+                os.remove(f"{temp}.mp4")
+
+    return filename
+
+
+def append_verse(
+    session: SinglePassSession,
+    renderer: Renderer,
+    verse_info: VerseInformation,
+    dist: str,
+    verse_files: bool = False,
+    profile: EncoderProfile = PROFILES["default"],
+    verbose: bool = False,
+    progress: bool = True,
+):
+    key = verse_info.verse_key
+
+    verbose_echo(verbose, "extracting clips...")
+    with PROFILER.stage("extract_clips"):
+        clips, audio = extract_clips(verse_info)
+
+    if not clips:
+        raise ValueError(f"no clips found for verse {key}")
+
+    with PROFILER.stage("fonts"):
+        preload_verse_fonts(renderer, [verse_info])
+
+    out = None
+    if verse_files:
+        out = FFmpegWriter(
+            verse_filename(dist, key),
+            renderer.frame_size,
+            renderer.fps,
+            profile=profile,
+            **audio_options(audio),
+        )
+
+    try:
+        clips = tqdm(clips, "rendering", disable=not progress)
+        with PROFILER.stage("render"):
+            for frame, repeat in pipelined_clips2frames(renderer, clips):
+                with PROFILER.stage("encode", trace=False):
+                    session.write(frame, repeat)
+                    if out is not None:
+                        out.write(frame, repeat)
+                PROFILER.count("frames", repeat)
+
+        session.end_chapter(str(key), audio)
+    except BaseException:
+        if out is not None:
+            out.abort()
+        raise
+    finally:
+        audio.close()
+
+    if out is not None:
+        with PROFILER.stage("mux"):
+            out.release()
+
+
+# per worker process state, see `_init_worker`
+_settings: Optional[RenderSettings] = None
+_renderer: Optional[Renderer] = None
+
+
+def _init_worker(settings: RenderSettings):
+    global _settings, _renderer
+
+    settings.configure_cache()
+    # runs as the worker exits, unlike `atexit`
+    Finalize(None, release_decoded_audio, exitpriority=10)
+    if settings.profile:
+        PROFILER.enable()
+    _settings = settings
+    _renderer = settings.renderer()
+
+
+def _render_key(key: VerseKey):
+    """(filename, error, profiler state, (encoded frames, seconds)) of one verse"""
+    # counted per verse, the parent adds them up
+    ENCODE_STATS.reset()
+
+    with PROFILER.verse(str(key)):
+        try:
+            with PROFILER.stage("verse_info"):
+                verse_info = load_verse(
+                    key, _settings.reciter, chapter_audio=_settings.chapter_audio
+                )
+        except Exception:
+            return None, f"key '{key}' not found", None, (0, 0.0)
+
+        try:
+            filename = render_verse(
+                _renderer,
+                verse_info,
+                _settings.dist,
+                encoder=_settings.encoder,
+                profile=_settings.encode_profile,
+                progress=False,
+            )
+        except Exception as e:
+            return None, f"key '{key}' failed: {e}", None, (0, 0.0)
+
+    stats = (ENCODE_STATS.frames, ENCODE_STATS.seconds)
+    if not _settings.profile:
+        return filename, None, None, stats
+
+    # handed over to the parent, which merges it into its own profiler
+    state = PROFILER.dump()
+    PROFILER.enable()
+    return filename, None, state, stats
+
+
+def render_parallel(settings: RenderSettings, keys: List[VerseKey], jobs: int):
+    """render every key in a worker process, results keep the order of `keys`"""
+    # not forked while prefetch threads hold locks and sockets of the session
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(settings,),
+    ) as pool:
+        return list(pool.map(_render_key, keys))
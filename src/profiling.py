@@ -0,0 +1,210 @@
+from typing import Any, Dict, List, Optional
+from contextlib import contextmanager
+from threading import Lock, local, get_ident
+import json
+import time
+import os
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+
+REPORT_VERSION = 1
+
+
+def children_cpu() -> float:
+    """cpu seconds of the waited for subprocesses, ffmpeg mostly"""
+    if resource is None:
+        return 0.0
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+class Profiler:
+    """
+    per stage wall/cpu time, counters and per verse summaries; every method is
+    a no-op until `enabled` is set
+    """
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.start = time.perf_counter()
+
+        # name: [calls, wall, self wall, thread cpu, children cpu] in seconds
+        self.stages: Dict[str, List[float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.verses: List[Dict[str, Any]] = []
+        # chrome trace "complete" events
+        self.events: List[Dict[str, Any]] = []
+
+        self._lock = Lock()
+        self._local = local()
+
+    def enable(self):
+        self.__init__()
+        self.enabled = True
+
+    @contextmanager
+    def stage(self, name: str, trace: bool = True, **args):
+        """time the block, `trace=False` keeps hot stages out of the trace"""
+        if not self.enabled:
+            yield
+            return
+
+        stack = self._local.__dict__.setdefault("stack", [])
+        # time spent in nested stages, subtracted for the self time
+        stack.append(0.0)
+
+        cpu, children = time.thread_time(), children_cpu()
+        begin = time.perf_counter()
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - begin
+            cpu = time.thread_time() - cpu
+            children = children_cpu() - children
+
+            nested = stack.pop()
+            if stack:
+                stack[-1] += wall
+
+            with self._lock:
+                totals = self.stages.setdefault(name, [0, 0.0, 0.0, 0.0, 0.0])
+                totals[0] += 1
+                totals[1] += wall
+                totals[2] += wall - nested
+                totals[3] += cpu
+                totals[4] += children
+
+                if trace:
+                    self.events.append(
+                        {
+                            "name": name,
+                            "ph": "X",
+                            # the monotonic clock is shared by the worker processes
+                            "ts": begin * 1e6,
+                            "dur": wall * 1e6,
+                            "pid": os.getpid(),
+                            "tid": get_ident(),
+                            "args": args,
+                        }
+                    )
+
+    def count(self, name: str, value: float = 1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    @contextmanager
+    def verse(self, key: str):
+        """the stages and counters of one verse, with its frame rates"""
+        if not self.enabled:
+            yield
+            return
+
+        with self._lock:
+            stages = {name: list(totals) for name, totals in self.stages.items()}
+            counters = dict(self.counters)
+
+        with self.stage("verse", key=key):
+            yield
+
+        with self._lock:
+            walls = {
+                name: totals[1] - stages.get(name, [0, 0.0])[1]
+                for name, totals in self.stages.items()
+            }
+            selves = {
+                name: totals[2] - stages.get(name, [0, 0.0, 0.0])[2]
+                for name, totals in self.stages.items()
+            }
+            deltas = {
+                name: value - counters.get(name, 0)
+                for name, value in self.counters.items()
+            }
+
+        frames = deltas.get("frames", 0)
+        # frame generation alone, the writes happen inside the render loop; a
+        # pipelined render waits on its producer thread, which is timed instead
+        render = selves.get("produce") or selves.get("render", 0.0)
+        encode = walls.get("encode", 0.0) + walls.get("mux", 0.0)
+
+        self.verses.append(
+            {
+                "key": key,
+                "wall_ms": milliseconds(walls["verse"]),
+                "frames": frames,
+                "render_fps": round(frames / render, 3) if render else None,
+                "encode_fps": round(frames / encode, 3) if encode else None,
+                "bytes_downloaded": deltas.get("bytes_downloaded", 0),
+                "stages": {
+                    name: milliseconds(wall)
+                    for name, wall in walls.items()
+                    if wall and name != "verse"
+                },
+            }
+        )
+
+    def dump(self) -> Dict[str, Any]:
+        """the raw state, to be merged into the profiler of another process"""
+        return {
+            "stages": self.stages,
+            "counters": self.counters,
+            "verses": self.verses,
+            "events": self.events,
+        }
+
+    def merge(self, state: Optional[Dict[str, Any]]):
+        if not self.enabled or state is None:
+            return
+        with self._lock:
+            for name, totals in state["stages"].items():
+                current = self.stages.setdefault(name, [0, 0.0, 0.0, 0.0, 0.0])
+                for index, value in enumerate(totals):
+                    current[index] += value
+            for name, value in state["counters"].items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            self.verses.extend(state["verses"])
+            self.events.extend(state["events"])
+
+    def report(self, **settings) -> Dict[str, Any]:
+        return {
+            "version": REPORT_VERSION,
+            "settings": settings,
+            "wall_ms": milliseconds(time.perf_counter() - self.start),
+            "stages": {
+                name: {
+                    "calls": int(calls),
+                    "wall_ms": milliseconds(wall),
+                    "self_ms": milliseconds(self_wall),
+                    "cpu_ms": milliseconds(cpu),
+                    "children_cpu_ms": milliseconds(children),
+                }
+                for name, (calls, wall, self_wall, cpu, children) in sorted(
+                    self.stages.items()
+                )
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "verses": self.verses,
+        }
+
+    def trace(self) -> Dict[str, Any]:
+        """the stages in the chrome://tracing (and Perfetto) JSON format"""
+        return {"traceEvents": self.events, "displayTimeUnit": "ms"}
+
+    def save(self, filename: str, trace: Optional[str] = None, **settings):
+        with open(filename, "w") as f:
+            json.dump(self.report(**settings), f, indent=2)
+        if trace is not None:
+            with open(trace, "w") as f:
+                json.dump(self.trace(), f)
+
+
+def milliseconds(seconds: float) -> float:
+    return round(seconds * 1000, 3)
+
+
+PROFILER = Profiler()
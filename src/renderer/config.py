@@ -1 +1,29 @@
+from typing import List, Literal
+
 OPEN_SANS = "https://fonts.gstatic.com/s/opensans/v23/mem8YaGs126MiZpBA-UFVZ0e.ttf"
+
+QURAN_FONT_SIZE = 35
+TRANSLATION_FONT_SIZE = 20
+# the quran font size is never shrunk below this to fit a frame
+MIN_FONT_SIZE = 12
+
+# of the frame, a clip is laid out within
+TEXT_MAX_WIDTH_RATIO = 0.8
+TEXT_MAX_HEIGHT_RATIO = 0.9
+# between lines, in pixels
+VERTICAL_PADDING = 5
+
+# BGR, as the frames are written
+TEXT_FILL = (255, 255, 255)
+HIGHLIGHT_FILL = (80, 200, 255)
+
+# frame runs built ahead of the writer on a producer thread, 0 builds them
+# in the writing thread; off until it measures faster than ffmpeg alone
+PIPELINE_DEPTH = 0
+
+# bump whenever the layout of `clip2image` changes
+FRAME_CACHE_VERSION = 4
+FRAME_NAMESPACE = f"frames/v{FRAME_CACHE_VERSION}"
+
+TransitionName = Literal["fade", "crossfade", "slide"]
+TRANSITION_NAMES: List[TransitionName] = ["fade", "crossfade", "slide"]
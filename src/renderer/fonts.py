@@ -0,0 +1,99 @@
+from typing import Dict, Iterable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+from threading import Lock
+import os
+
+from PIL.ImageFont import FreeTypeFont
+
+from ..utilities import fetch_file, PREFETCH_WORKERS
+from ..verse.config import FONT_NAMESPACE
+
+
+class FontRegistry:
+    """
+    every font loaded once per (url, size) and shared by all renderers; faces
+    are opened from their file, which FreeType maps instead of copying, found
+    in `directory` by name (e.g. p1.ttf) before the download cache
+    """
+
+    def __init__(
+        self, directory: Optional[str] = None, workers: int = PREFETCH_WORKERS
+    ) -> None:
+        self.directory = directory
+        self.workers = workers
+
+        self.fonts: Dict[Tuple[str, int], FreeTypeFont] = {}
+        # url: local file
+        self.paths: Dict[str, str] = {}
+
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = Lock()
+        # held while a (url, size) loads, so it only loads once
+        self._loading: Dict[Tuple[str, int], Lock] = {}
+
+    def path(self, url: str, namespace: str = FONT_NAMESPACE) -> str:
+        """the local file of `url`, downloaded unless found in `directory`"""
+        path = self.paths.get(url)
+        if path is not None:
+            return path
+
+        if self.directory is not None:
+            path = os.path.join(self.directory, os.path.basename(urlparse(url).path))
+        if path is None or not os.path.isfile(path):
+            path = fetch_file(url, namespace=namespace)
+
+        self.paths[url] = path
+        return path
+
+    def font(self, url: str, size: int, namespace: str = FONT_NAMESPACE):
+        key = (url, size)
+        with self._lock:
+            font = self.fonts.get(key)
+            if font is not None:
+                self.hits += 1
+                return font
+            loading = self._loading.setdefault(key, Lock())
+
+        with loading:
+            font = self.fonts.get(key)
+            if font is None:
+                font = FreeTypeFont(self.path(url, namespace), size=size)
+                with self._lock:
+                    self.fonts[key] = font
+                    self.misses += 1
+                    self._loading.pop(key, None)
+
+        return font
+
+    def preload(
+        self, urls: Iterable[str], size: int, namespace: str = FONT_NAMESPACE
+    ) -> Dict[str, FreeTypeFont]:
+        """the fonts of `urls` at `size`, downloaded and loaded in parallel"""
+        urls = list(dict.fromkeys(urls))
+        if len(urls) <= 1 or all((url, size) in self.fonts for url in urls):
+            return {url: self.font(url, size, namespace) for url in urls}
+
+        workers = min(self.workers, len(urls))
+        with ThreadPoolExecutor(workers, thread_name_prefix="fonts") as executor:
+            fonts = executor.map(lambda url: self.font(url, size, namespace), urls)
+            return dict(zip(urls, fonts))
+
+    def stats(self):
+        return {
+            "fonts": len(self.fonts),
+            "files": len(self.paths),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+FONTS = FontRegistry()
+
+
+def configure_fonts(directory: Optional[str] = None):
+    FONTS.__init__(directory=directory)
+
+    return FONTS
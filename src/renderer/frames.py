@@ -0,0 +1,176 @@
+from typing import Callable, Dict, Optional, Sequence
+from functools import partial
+from io import BytesIO
+
+import numpy as np
+
+
+from .utilities import (
+    time_step2frame_index,
+    verse_words_load_fonts,
+    load_font,
+    clip_digest,
+    active_words,
+)
+
+from ..verse import verse_info_by_key, VerseKey, ClipInformation, extract_clips
+from ..verse.types import VerseInformation
+from ..utilities import CACHE
+
+from .types import Renderer
+from .layout import Layout
+from .fonts import FONTS
+from .glyphs import blit_text
+from .transitions import transition_frames
+from .pipelined import pipelined
+from .config import OPEN_SANS, FRAME_NAMESPACE, TEXT_FILL
+
+
+def preload_verse_fonts(renderer: Renderer, verses: Sequence[VerseInformation]):
+    """the page fonts of `verses` at the size of `renderer`, loaded in parallel"""
+    urls = [word.font_url for verse in verses for word in verse.content]
+    return FONTS.preload(urls, renderer.quran_font_size)
+
+
+def clip2layout(renderer: Renderer, clip: ClipInformation) -> Layout:
+    """the lines of `clip` fitted to the frame, memoized by `renderer.layouts`"""
+    fonts = verse_words_load_fonts(clip.content, renderer.quran_font_size)
+
+    return renderer.layouts.layout(
+        [(word.content, fonts[word.font_url]) for word in clip.content],
+        " ".join(word.translation for word in clip.content),
+        renderer.translation_font,
+        renderer.quran_font_size,
+    )
+
+
+def clip2image(renderer: Renderer, clip: ClipInformation):
+    layout = clip2layout(renderer, clip)
+
+    canvas = np.zeros((renderer.height, renderer.width, 3), dtype=np.uint8)
+    for font, text, x, y in layout.placed:
+        blit_text(canvas, font, text, x, y, TEXT_FILL)
+
+    return canvas
+
+
+def cached_clip2image(renderer: Renderer, clip: ClipInformation):
+    if not renderer.frame_cache:
+        return clip2image(renderer, clip)
+
+    name = f"frame:{clip_digest(renderer, clip)}"
+    data = CACHE.get(name, namespace=FRAME_NAMESPACE)
+    if data is not None:
+        return np.load(BytesIO(data))["image"]
+
+    image = clip2image(renderer, clip)
+
+    buffer = BytesIO()
+    np.savez_compressed(buffer, image=image)
+    CACHE.put(name, buffer.getvalue(), namespace=FRAME_NAMESPACE)
+
+    return image
+
+
+def highlight_updates(renderer: Renderer, clip: ClipInformation, image: np.ndarray):
+    """`transition_frames` updates switching the highlighted word of `clip`"""
+    layout = clip2layout(renderer, clip)
+
+    engine = renderer.highlights
+    engine.begin(image, layout, TEXT_FILL)
+
+    return {
+        index: partial(
+            engine.frame,
+            None if word is None else layout.words[word],
+            renderer.highlight_fill,
+        )
+        for index, word in active_words(clip, renderer.fps).items()
+    }
+
+
+def image2frames(
+    renderer: Renderer,
+    image: np.ndarray,
+    duration: int,
+    previous: Optional[np.ndarray] = None,
+    following: bool = False,
+    updates: Optional[Dict[int, Callable[[], np.ndarray]]] = None,
+):
+    frame_count = time_step2frame_index(duration, renderer.fps)
+
+    transition_duration = int(min(duration * (1 / 6), 500))
+    transition_duration = time_step2frame_index(transition_duration, renderer.fps)
+
+    return transition_frames(
+        renderer.transitions,
+        renderer.transition,
+        image,
+        frame_count,
+        transition_duration,
+        previous=previous,
+        following=following,
+        updates=updates,
+    )
+
+
+def clip2frames(renderer: Renderer, clip: ClipInformation):
+    static_image = cached_clip2image(renderer, clip)
+
+    updates = None
+    if renderer.highlight:
+        updates = highlight_updates(renderer, clip, static_image)
+
+    yield from image2frames(renderer, static_image, clip.duration, updates=updates)
+
+
+def clips2frames(renderer: Renderer, clips: Sequence[ClipInformation]):
+    """frames of consecutive clips, so transitions can span clip boundaries"""
+    previous = None
+
+    for index, clip in enumerate(clips):
+        static_image = cached_clip2image(renderer, clip)
+
+        updates = None
+        if renderer.highlight:
+            updates = highlight_updates(renderer, clip, static_image)
+
+        yield from image2frames(
+            renderer,
+            static_image,
+            clip.duration,
+            previous=previous,
+            following=index + 1 < len(clips),
+            updates=updates,
+        )
+        previous = static_image
+
+
+def pipelined_clips2frames(renderer: Renderer, clips: Sequence[ClipInformation]):
+    """`clips2frames` built ahead of the caller when `renderer.pipeline_depth` is set"""
+    frames = clips2frames(renderer, clips)
+    if renderer.pipeline_depth:
+        frames = pipelined(frames, renderer.pipeline_depth)
+
+    return frames
+
+
+if __name__ == "__main__":
+    renderer = Renderer(
+        translation_font=load_font(OPEN_SANS, size=20),
+        height=1080,
+        width=540,
+        fps=20,
+        quran_font_size=40,
+    )
+
+    clips, audio = extract_clips(verse_info_by_key(VerseKey(chapter_id=1, verse_id=1)))
+
+    for clip in clips:
+        out = renderer.video_writer(f"dist/{clip.filename()}.mp4")
+        for frame, repeat in clip2frames(renderer, clip):
+            for _ in range(repeat):
+                out.write(frame)
+        out.release()
+
+    audio.close()
@@ -0,0 +1,133 @@
+from typing import Dict, Tuple
+from weakref import WeakKeyDictionary
+from threading import Lock
+import math
+
+from PIL import Image, ImageDraw
+from PIL.ImageFont import FreeTypeFont
+import numpy as np
+
+
+# horizontal pen positions are snapped to this fraction of a pixel
+SUBPIXEL_PHASES = 4
+
+# (font, text, x, y), a term at its pen position on the canvas
+PlacedText = Tuple[FreeTypeFont, str, float, float]
+
+
+class Glyph:
+    """a rasterized term: coverage mask and its offset from the pen position"""
+
+    def __init__(self, mask: np.ndarray, offset: Tuple[int, int]) -> None:
+        self.mask = mask
+        self.offset = offset
+
+
+class GlyphCache:
+    """
+    term widths and bitmaps per font, a font object is a (face, size) pair;
+    shared by the renderers of every thread
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        """forget every width and bitmap"""
+        with self._lock:
+            self.widths: "WeakKeyDictionary[FreeTypeFont, Dict[str, int]]"
+            self.widths = WeakKeyDictionary()
+            # (text, subpixel phase) keys
+            self.glyphs: "WeakKeyDictionary[FreeTypeFont, Dict[Tuple[str, int], Glyph]]"
+            self.glyphs = WeakKeyDictionary()
+
+            self.hits = 0
+            self.misses = 0
+
+    def width(self, font: FreeTypeFont, text: str) -> int:
+        with self._lock:
+            widths = self.widths.setdefault(font, {})
+            width = widths.get(text)
+            if width is None:
+                width = widths[text] = round(font.getlength(text))
+
+        return width
+
+    def glyph(self, font: FreeTypeFont, text: str, phase: int = 0) -> Glyph:
+        """`text` rasterized `phase / SUBPIXEL_PHASES` of a pixel to the right"""
+        with self._lock:
+            glyphs = self.glyphs.setdefault(font, {})
+            glyph = glyphs.get((text, phase))
+            if glyph is not None:
+                self.hits += 1
+                return glyph
+            self.misses += 1
+
+        # rasterized unlocked, a term drawn by two threads at once is kept once
+        left, top, right, bottom = font.getbbox(text)
+
+        # one spare column for the subpixel shift
+        size = (max(right - left + 1, 0), max(bottom - top, 0))
+        image = Image.new("L", size, 0)
+        if right > left and bottom > top:
+            x = -left + phase / SUBPIXEL_PHASES
+            ImageDraw.Draw(image).text((x, -top), text, font=font, fill=255)
+
+        glyph = Glyph(np.asarray(image), (left, top))
+        with self._lock:
+            return glyphs.setdefault((text, phase), glyph)
+
+
+GLYPHS = GlyphCache()
+
+
+def snap(x: float, y: float) -> Tuple[int, int, int]:
+    """the whole pixel pen position and subpixel phase of (x, y)"""
+    pen_x, pen_y = math.floor(x), math.floor(y)
+    phase = round((x - pen_x) * SUBPIXEL_PHASES)
+    if phase == SUBPIXEL_PHASES:
+        pen_x, phase = pen_x + 1, 0
+
+    return pen_x, pen_y, phase
+
+
+def blit_text(
+    canvas: np.ndarray, font: FreeTypeFont, text: str, x: float, y: float, fill
+):
+    """`ImageDraw.text` onto an array, from cached glyphs"""
+    pen_x, pen_y, phase = snap(x, y)
+    blit(canvas, GLYPHS.glyph(font, text, phase), pen_x, pen_y, fill)
+
+
+def text_box(
+    font: FreeTypeFont, text: str, x: float, y: float
+) -> Tuple[int, int, int, int]:
+    """(left, top, right, bottom) of the pixels `blit_text` touches"""
+    pen_x, pen_y, phase = snap(x, y)
+    glyph = GLYPHS.glyph(font, text, phase)
+    height, width = glyph.mask.shape
+    left, top = pen_x + glyph.offset[0], pen_y + glyph.offset[1]
+
+    return left, top, left + width, top + height
+
+
+def blit(canvas: np.ndarray, glyph: Glyph, x: int, y: int, fill):
+    """alpha blend `fill` through the glyph mask onto `canvas` at pen (x, y)"""
+    height, width = glyph.mask.shape
+    x += glyph.offset[0]
+    y += glyph.offset[1]
+
+    # clip to the canvas
+    left, top = max(x, 0), max(y, 0)
+    right = min(x + width, canvas.shape[1])
+    bottom = min(y + height, canvas.shape[0])
+    if left >= right or top >= bottom:
+        return
+
+    mask = glyph.mask[top - y : bottom - y, left - x : right - x]
+    mask = mask[..., None].astype(np.uint16)
+    region = canvas[top:bottom, left:right]
+
+    fill = np.array(fill, dtype=np.uint16)
+    region[:] = (region * (255 - mask) + fill * mask + 127) // 255
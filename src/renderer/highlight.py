@@ -0,0 +1,79 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .glyphs import PlacedText, blit_text
+from .layout import Box, Layout
+
+
+class HighlightEngine:
+    """
+    karaoke frames of a clip image with one of its terms in another fill, built
+    into a small ring of reusable buffers: switching terms restores the box of
+    the previous one from the image and redraws only the box of the new one,
+    a frame stays valid until `ring - 1` more are built
+    """
+
+    def __init__(self, frame_shape: Tuple[int, ...], ring: int = 2) -> None:
+        self.buffers = [np.empty(frame_shape, dtype=np.uint8) for _ in range(ring)]
+        self.cursor = 0
+        # the term drawn active in every buffer, None until it holds the image
+        self.shown: List[Optional[int]] = [None] * ring
+
+        self.image: Optional[np.ndarray] = None
+        self.placed: Sequence[PlacedText] = []
+        self.boxes: List[Box] = []
+        self.fill = None
+
+        # every box redrawn, in pixels
+        self.redrawn = 0
+
+    def begin(self, image: np.ndarray, layout: Layout, fill):
+        """highlight the terms of `image`, drawn from `layout` in `fill`"""
+        self.image = image
+        self.placed = layout.placed
+        self.boxes = layout.boxes
+        self.fill = fill
+        self.shown = [None] * len(self.buffers)
+
+    def frame(self, active: Optional[int], active_fill) -> np.ndarray:
+        """the image with `placed[active]` drawn in `active_fill`"""
+        if active is None:
+            return self.image
+
+        self.cursor = (self.cursor + 1) % len(self.buffers)
+        out = self.buffers[self.cursor]
+        shown = self.shown[self.cursor]
+
+        if shown is None:
+            np.copyto(out, self.image)
+        elif shown != active:
+            left, top, right, bottom = self.boxes[shown]
+            out[top:bottom, left:right] = self.image[top:bottom, left:right]
+
+        if shown != active:
+            self.redraw(out, active, active_fill)
+            self.shown[self.cursor] = active
+
+        return out
+
+    def redraw(self, out: np.ndarray, active: int, active_fill):
+        """draw the box of `placed[active]` again, overlapping terms included"""
+        left, top, right, bottom = self.boxes[active]
+        if left >= right or top >= bottom:
+            return
+
+        region = out[top:bottom, left:right]
+        # the background of `clip2image`
+        region.fill(0)
+        self.redrawn += region.shape[0] * region.shape[1]
+
+        # in drawing order, so overlapping edges blend as in the full render
+        for index, (font, text, x, y) in enumerate(self.placed):
+            box = self.boxes[index]
+            if box[0] >= right or box[2] <= left or box[1] >= bottom or box[3] <= top:
+                continue
+
+            fill = active_fill if index == active else self.fill
+            # whole pixel shifts keep the subpixel phase of the full render
+            blit_text(region, font, text, x - left, y - top, fill)
@@ -0,0 +1,291 @@
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+from collections import OrderedDict
+from weakref import WeakKeyDictionary
+
+from PIL.ImageFont import FreeTypeFont
+import numpy as np
+
+from .glyphs import GLYPHS, PlacedText, blit_text, text_box
+from .config import (
+    TEXT_MAX_WIDTH_RATIO,
+    TEXT_MAX_HEIGHT_RATIO,
+    VERTICAL_PADDING,
+    MIN_FONT_SIZE,
+)
+
+# (left, top, right, bottom) in pixels
+Box = Tuple[int, int, int, int]
+
+
+class Term:
+    def __init__(self, content: str, font: FreeTypeFont) -> None:
+        self.content = content
+        self.font = font
+
+        self.width = GLYPHS.width(self.font, self.content)
+
+
+class TextRenderer:
+    def __init__(self, terms: List[Term]) -> None:
+        self.terms = terms
+        self.text_width = sum(map(lambda term: term.width, self.terms))
+
+    def place(self, x: float, y: float) -> List[PlacedText]:
+        """the pen position of every term, centered on `x`"""
+        x -= self.text_width / 2
+
+        placed = []
+        for term in self.terms:
+            placed.append((term.font, term.content, x, y))
+            x += term.width
+
+        return placed
+
+    def render(
+        self,
+        canvas: np.ndarray,
+        x: float,
+        y: float,
+        fill,
+        active_term: Term = None,
+        active_fill=None,
+    ):
+        for term, placed in zip(self.terms, self.place(x, y)):
+            blit_text(canvas, *placed, active_fill if term is active_term else fill)
+
+
+def terms2lines(terms: List[Term], max_width: int):
+    temp: List[Term] = []
+
+    width = 0
+    for term in terms:
+        term_width = term.width
+
+        # a term wider than `max_width` gets a line of its own, never an empty one
+        if temp and width + term_width > max_width:
+            yield temp
+            temp = []
+            width = 0
+
+        temp.append(term)
+        width += term_width
+
+    if temp:
+        yield temp
+
+
+def text2terms(text: str, font: FreeTypeFont):
+    space = Term(" ", font)
+    terms = [[Term(w, font), space] for w in text.split(" ")]
+    terms = sum(terms, [])
+
+    return terms
+
+
+class Layout:
+    """
+    the lines of a clip at one pair of font sizes, placed once and shared by
+    its rasterization and highlighting
+    """
+
+    def __init__(
+        self,
+        quran_lines: List[TextRenderer],
+        translation_lines: List[TextRenderer],
+        quran_font_size: int,
+        translation_font_size: int,
+    ) -> None:
+        self.quran_lines = quran_lines
+        self.translation_lines = translation_lines
+        self.quran_font_size = quran_font_size
+        self.translation_font_size = translation_font_size
+
+        # of the widest line, over the maximum only when a single term is
+        self.width = max(
+            (line.text_width for line in [*quran_lines, *translation_lines]),
+            default=0,
+        )
+        quran_line = quran_font_size + VERTICAL_PADDING
+        translation_line = translation_font_size + VERTICAL_PADDING
+        # of the whole block, a blank translation line between the two parts
+        self.height = (
+            len(quran_lines) * quran_line
+            + (len(translation_lines) + 1) * translation_line
+            - VERTICAL_PADDING
+        )
+
+        self.placed: List[PlacedText] = []
+        # the index in `placed` of every verse word
+        self.words: List[int] = []
+        self._boxes: Optional[List[Box]] = None
+        self._frame_size = (0, 0)
+
+    def place(self, width: int, height: int):
+        """the block centered in a `width` x `height` frame"""
+        self.placed = []
+        self.words = []
+        self._boxes = None
+        self._frame_size = (width, height)
+
+        y = (height - self.height) / 2
+        for line in self.quran_lines:
+            line_placed = line.place(width / 2, y)
+            # the words are laid out in order, right to left within a line
+            for index in reversed(range(len(line_placed))):
+                self.words.append(len(self.placed) + index)
+            self.placed += line_placed
+            y += self.quran_font_size + VERTICAL_PADDING
+        y += self.translation_font_size + VERTICAL_PADDING
+        for line in self.translation_lines:
+            self.placed += line.place(width / 2, y)
+            y += self.translation_font_size + VERTICAL_PADDING
+
+    @property
+    def boxes(self) -> List[Box]:
+        """the pixels every placed term touches, clipped to the frame"""
+        if self._boxes is None:
+            width, height = self._frame_size
+            self._boxes = []
+            for font, text, x, y in self.placed:
+                left, top, right, bottom = text_box(font, text, x, y)
+                self._boxes.append(
+                    (max(left, 0), max(top, 0), min(right, width), min(bottom, height))
+                )
+
+        return self._boxes
+
+
+class LayoutEngine:
+    """
+    lays out clips in a `width` x `height` frame: line breaks, block height and
+    pen positions are computed once per content and fonts, at the largest font
+    sizes (scaled together, up to the given ones) whose block fits the frame
+    """
+
+    def __init__(self, width: int, height: int, capacity: int = 256) -> None:
+        self.width = width
+        self.height = height
+        self.max_width = int(width * TEXT_MAX_WIDTH_RATIO)
+        self.max_height = int(height * TEXT_MAX_HEIGHT_RATIO)
+
+        self.capacity = capacity
+        self.layouts: "OrderedDict[Hashable, Layout]" = OrderedDict()
+        # font: {size: the same face at that size}
+        self.variants: "WeakKeyDictionary[FreeTypeFont, Dict[int, FreeTypeFont]]"
+        self.variants = WeakKeyDictionary()
+
+        self.hits = 0
+        self.misses = 0
+
+    def variant(self, font: FreeTypeFont, size: int) -> FreeTypeFont:
+        """`font` at `size`, one object per size so its glyphs stay cached"""
+        if size == font.size:
+            return font
+
+        variants = self.variants.setdefault(font, {})
+        if size not in variants:
+            variants[size] = font.font_variant(size=size)
+
+        return variants[size]
+
+    def break_lines(
+        self,
+        words: Sequence[Tuple[str, FreeTypeFont]],
+        translation: str,
+        translation_font: FreeTypeFont,
+        quran_font_size: int,
+        scale: float,
+    ) -> Layout:
+        translation_font_size = max(round(translation_font.size * scale), 1)
+        translation_font = self.variant(translation_font, translation_font_size)
+
+        terms = [
+            Term(content, self.variant(font, quran_font_size))
+            for content, font in words
+        ]
+        translation_terms = text2terms(translation, translation_font)
+
+        return Layout(
+            [
+                TextRenderer(list(reversed(line)))
+                for line in terms2lines(terms, self.max_width)
+            ],
+            [
+                TextRenderer(line)
+                for line in terms2lines(translation_terms, self.max_width)
+            ],
+            quran_font_size,
+            translation_font_size,
+        )
+
+    def fit(
+        self,
+        words: Sequence[Tuple[str, FreeTypeFont]],
+        translation: str,
+        translation_font: FreeTypeFont,
+        quran_font_size: int,
+    ) -> Layout:
+        """
+        the largest quran font size up to `quran_font_size` whose block fits,
+        its widest term included
+        """
+
+        def lines(size: int) -> Layout:
+            return self.break_lines(
+                words, translation, translation_font, size, size / quran_font_size
+            )
+
+        max_height = self.max_height
+
+        def fits(layout: Layout) -> bool:
+            return layout.height <= max_height and layout.width <= self.max_width
+
+        layout = lines(quran_font_size)
+        if fits(layout):
+            return layout
+
+        # the smallest size is kept even when its block is too high, not when a
+        # term is too wide: that one shrinks further until the term fits
+        low, high = min(MIN_FONT_SIZE, quran_font_size), quran_font_size - 1
+        layout = lines(low)
+        if layout.width > self.max_width:
+            low, high, max_height = 1, low - 1, float("inf")
+            layout = lines(low)
+
+        while low < high:
+            middle = (low + high + 1) // 2
+            candidate = lines(middle)
+            if fits(candidate):
+                low, layout = middle, candidate
+            else:
+                high = middle - 1
+
+        return layout
+
+    def layout(
+        self,
+        words: Sequence[Tuple[str, FreeTypeFont]],
+        translation: str,
+        translation_font: FreeTypeFont,
+        quran_font_size: int,
+    ) -> Layout:
+        """
+        `words` (content, font at `quran_font_size`) over their `translation`,
+        placed in the frame; the same object for the same content and fonts
+        """
+        key = (tuple(words), translation, translation_font, quran_font_size)
+        layout = self.layouts.get(key)
+        if layout is not None:
+            self.hits += 1
+            self.layouts.move_to_end(key)
+            return layout
+
+        self.misses += 1
+        layout = self.fit(words, translation, translation_font, quran_font_size)
+        layout.place(self.width, self.height)
+
+        self.layouts[key] = layout
+        if len(self.layouts) > self.capacity:
+            self.layouts.popitem(last=False)
+
+        return layout
@@ -0,0 +1,119 @@
+from typing import Any, Dict, Iterator
+from queue import Queue, Empty, Full
+from threading import Event, Lock, Thread
+import time
+
+from ..profiling import PROFILER
+from .transitions import FrameRun
+
+# how long a blocked stage waits before checking whether to give up
+POLL_SECONDS = 0.1
+
+_DONE = object()
+
+
+class PipelineStats:
+    """
+    runs passed from the producer thread to the writing one, the time either
+    side waited on the other and how full the queue was
+    """
+
+    def __init__(self) -> None:
+        self._lock = Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.runs = 0
+            self.frames = 0
+            # waiting for room in a full queue, the writer is behind
+            self.producer_stall = 0.0
+            # waiting on an empty queue, the producer is behind
+            self.consumer_stall = 0.0
+
+            # queue depth seen by every run taken
+            self.depth_total = 0
+            self.depth_max = 0
+
+    def add(self, depth: int, repeat: int, stall: float):
+        with self._lock:
+            self.runs += 1
+            self.frames += repeat
+            self.consumer_stall += stall
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+    def stalled(self, seconds: float):
+        with self._lock:
+            self.producer_stall += seconds
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "runs": self.runs,
+            "frames": self.frames,
+            "mean_depth": round(self.depth_total / self.runs, 2) if self.runs else 0,
+            "max_depth": self.depth_max,
+            "producer_stall_seconds": round(self.producer_stall, 3),
+            "consumer_stall_seconds": round(self.consumer_stall, 3),
+        }
+
+
+PIPELINE_STATS = PipelineStats()
+
+
+def pipelined(runs: Iterator[FrameRun], depth: int) -> Iterator[FrameRun]:
+    """
+    `runs` built on a producer thread up to `depth` runs ahead of the caller,
+    who writes them meanwhile; frames of a ring buffer must stay valid for
+    `depth + 1` more frames (`depth + 2` buffers)
+    """
+    queue: "Queue[Any]" = Queue(maxsize=depth)
+    stop = Event()
+
+    def put(item) -> bool:
+        begin = time.perf_counter()
+        # nested in "produce", which is left with the frame generation alone
+        with PROFILER.stage("produce_stall", trace=False):
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=POLL_SECONDS)
+                except Full:
+                    continue
+                PIPELINE_STATS.stalled(time.perf_counter() - begin)
+                return True
+        return False
+
+    def produce():
+        try:
+            with PROFILER.stage("produce"):
+                for run in runs:
+                    if not put(run):
+                        return
+        except BaseException as e:
+            # raised again by the caller
+            put(e)
+        else:
+            put(_DONE)
+
+    producer = Thread(target=produce, name="frames", daemon=True)
+    producer.start()
+    try:
+        while True:
+            begin = time.perf_counter()
+            while True:
+                try:
+                    item = queue.get(timeout=POLL_SECONDS)
+                    break
+                except Empty:
+                    if not producer.is_alive() and queue.empty():
+                        raise RuntimeError("the frame producer stopped")
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+
+            PIPELINE_STATS.add(queue.qsize(), item[1], time.perf_counter() - begin)
+            yield item
+    finally:
+        stop.set()
+        producer.join()
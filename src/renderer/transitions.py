@@ -0,0 +1,121 @@
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from .config import TransitionName, TRANSITION_NAMES
+
+
+# a frame shown `repeat` times in a row
+FrameRun = Tuple[np.ndarray, int]
+
+
+class TransitionEngine:
+    """
+    builds transition frames into a small ring of reusable buffers,
+    a yielded frame stays valid until `ring - 1` more frames are built
+    """
+
+    def __init__(self, frame_shape: Tuple[int, ...], ring: int = 2) -> None:
+        self.frame_shape = frame_shape
+        self.buffers = [np.empty(frame_shape, dtype=np.uint8) for _ in range(ring)]
+        self.cursor = 0
+
+        # transition duration, brightness of every step
+        self.ramps: Dict[int, List[float]] = {}
+
+    def buffer(self) -> np.ndarray:
+        self.cursor = (self.cursor + 1) % len(self.buffers)
+        return self.buffers[self.cursor]
+
+    def ramp(self, duration: int) -> List[float]:
+        ramp = self.ramps.get(duration)
+        if ramp is None:
+            ramp = [1 - step / duration for step in range(duration + 1)]
+            self.ramps[duration] = ramp
+
+        return ramp
+
+    def fade(self, image: np.ndarray, duration: int, step: int) -> np.ndarray:
+        """`image` darkened by `step / duration`"""
+        # a single saturating scale, measured faster than a `cv2.LUT` lookup
+        alpha = self.ramp(duration)[step]
+        return cv2.convertScaleAbs(image, dst=self.buffer(), alpha=alpha)
+
+    def crossfade(
+        self, source: np.ndarray, target: np.ndarray, duration: int, step: int
+    ) -> np.ndarray:
+        """`step / duration` of the way from `target` back to `source`"""
+        alpha = step / duration
+        return cv2.addWeighted(source, alpha, target, 1 - alpha, 0, dst=self.buffer())
+
+    def slide(self, image: np.ndarray, offset: int) -> np.ndarray:
+        """`image` moved `offset` pixels to the right (negative is left)"""
+        out = self.buffer()
+        width = image.shape[1]
+        offset = max(-width, min(width, offset))
+
+        out.fill(0)
+        if offset >= 0:
+            out[:, offset:] = image[:, : width - offset]
+        else:
+            out[:, :offset] = image[:, -offset:]
+
+        return out
+
+
+def transition_frames(
+    engine: TransitionEngine,
+    transition: TransitionName,
+    image: np.ndarray,
+    frame_count: int,
+    duration: int,
+    previous: Optional[np.ndarray] = None,
+    following: bool = False,
+    updates: Optional[Dict[int, Callable[[], np.ndarray]]] = None,
+) -> Iterator[FrameRun]:
+    """
+    the frames of one clip as (frame, repeat) runs: `previous` is the image of
+    the clip shown before it and `following` tells whether another clip comes
+    right after; from frame `index` on, the image is `updates[index]()`
+    """
+    begin = duration
+    end = frame_count - duration
+    width = image.shape[1]
+
+    # consecutive still frames are emitted as one run
+    still = 0
+
+    for index in range(frame_count + 1):
+        update = updates.get(index) if updates else None
+        if update is not None:
+            # built after the last run of the old image is written
+            if still:
+                yield image, still
+                still = 0
+            image = update()
+
+        step = 0
+        if duration and begin >= index:
+            step = begin - index
+        elif duration and index >= end:
+            step = index - end
+
+        if step == 0 or (transition == "crossfade" and index >= end and following):
+            still += 1
+            continue
+
+        if still:
+            yield image, still
+            still = 0
+
+        if transition == "crossfade" and index <= begin and previous is not None:
+            yield engine.crossfade(previous, image, duration, step), 1
+        elif transition == "slide":
+            offset = width * step // duration
+            yield engine.slide(image, offset if index <= begin else -offset), 1
+        else:
+            yield engine.fade(image, duration, step), 1
+
+    if still:
+        yield image, still
@@ -1,71 +1,81 @@
-from typing import List, Any, Dict
-
-from PIL.ImageFont import FreeTypeFont
-from PIL.ImageDraw import ImageDraw
-from pydantic import BaseModel
-
-from cv2 import VideoWriter, VideoWriter_fourcc
-
-
-fourcc = VideoWriter_fourcc(*"mp4v")
-
-
-class Term:
-    def __init__(self, content: str, font: FreeTypeFont) -> None:
-        self.content = content
-        self.font = font
-
-        self.width = round(self.font.getlength(self.content))
-
-
-class TextRenderer:
-    def __init__(self, terms: List[Term]) -> None:
-        self.terms = terms
-        self.text_width = sum(map(lambda term: term.width, self.terms))
-
-    def render(
-        self,
-        canvas: ImageDraw,
-        x: float,
-        y: float,
-        fill,
-        active_term: Term = None,
-        active_fill=None,
-    ):
-        x -= self.text_width / 2
-
-        for term in self.terms:
-            canvas.text(
-                (x, y),
-                term.content,
-                font=term.font,
-                fill=active_term if term is active_term else fill,
-            )
-            x += term.width
-
-
-class Renderer(BaseModel):
-    height: int
-    width: int
-
-    fps: int
-
-    quran_font_size: int = 35
-
-    # FreeTypeFont
-    translation_font: Any
-    # font_url, FreeTypeFont
-    font_cache: Dict[str, Any] = dict()
-
-    @property
-    def translation_font_size(self) -> int:
-        return self.translation_font.size
-
-    @property
-    def frame_size(self):
-        return (self.width, self.height)
-
-    def video_writer(self, filename: str):
-        return VideoWriter(
-            filename=filename, fourcc=fourcc, fps=self.fps, frameSize=self.frame_size
-        )
+from typing import Any, Tuple
+
+from pydantic import BaseModel, PrivateAttr
+
+from cv2 import VideoWriter, VideoWriter_fourcc
+
+from .transitions import TransitionEngine, TransitionName
+from .highlight import HighlightEngine
+from .layout import LayoutEngine
+from .config import QURAN_FONT_SIZE, HIGHLIGHT_FILL, PIPELINE_DEPTH
+
+
+class Renderer(BaseModel):
+    height: int
+    width: int
+
+    fps: int
+
+    quran_font_size: int = QURAN_FONT_SIZE
+
+    # FreeTypeFont, the page fonts come from `fonts.FONTS`
+    translation_font: Any
+
+    # reuse rasterized clip images from the disk cache
+    frame_cache: bool = True
+
+    transition: TransitionName = "fade"
+    _transitions: TransitionEngine = PrivateAttr(default=None)
+
+    # karaoke style, the word being recited in `highlight_fill`
+    highlight: bool = False
+    highlight_fill: Tuple[int, int, int] = HIGHLIGHT_FILL
+    _highlights: HighlightEngine = PrivateAttr(default=None)
+
+    _layouts: LayoutEngine = PrivateAttr(default=None)
+
+    # see `pipelined.pipelined`
+    pipeline_depth: int = PIPELINE_DEPTH
+
+    @property
+    def translation_font_size(self) -> int:
+        return self.translation_font.size
+
+    @property
+    def frame_size(self):
+        return (self.width, self.height)
+
+    @property
+    def ring(self) -> int:
+        """buffers of the frame engines, enough for the frames queued ahead"""
+        return self.pipeline_depth + 2
+
+    @property
+    def transitions(self) -> TransitionEngine:
+        if self._transitions is None:
+            self._transitions = TransitionEngine(
+                (self.height, self.width, 3), ring=self.ring
+            )
+        return self._transitions
+
+    @property
+    def layouts(self) -> LayoutEngine:
+        if self._layouts is None:
+            self._layouts = LayoutEngine(self.width, self.height)
+        return self._layouts
+
+    @property
+    def highlights(self) -> HighlightEngine:
+        if self._highlights is None:
+            self._highlights = HighlightEngine(
+                (self.height, self.width, 3), ring=self.ring
+            )
+        return self._highlights
+
+    def video_writer(self, filename: str, codec: str = "mp4v"):
+        return VideoWriter(
+            filename=filename,
+            fourcc=VideoWriter_fourcc(*codec),
+            fps=self.fps,
+            frameSize=self.frame_size,
+        )
@@ -1,61 +1,76 @@
-from typing import List, Dict
-
-from PIL.ImageFont import FreeTypeFont
-
-from .types import Term
-from ..utilities import virtual_io
-from ..verse.types import VerseWord
-
-FontCache = Dict[str, FreeTypeFont]
-
-
-def load_font(url: str, **kwargs):
-    return FreeTypeFont(virtual_io(url), **kwargs)
-
-
-def terms2lines(terms: List[Term], max_width: int):
-    temp: List[Term] = []
-
-    width = 0
-    for term in terms:
-        term_width = term.width
-
-        if width + term_width > max_width:
-            yield temp
-            temp = []
-            width = 0
-
-        temp.append(term)
-        width += term_width
-
-    if temp:
-        yield temp
-
-
-def text2terms(text: str, font: FreeTypeFont):
-    terms = [[Term(w, font), Term(" ", font)] for w in text.split(" ")]
-    terms = sum(terms, [])
-
-    return terms
-
-
-def verse_word2terms(verse_words: List[VerseWord], font_cache: FontCache):
-    return [Term(vw.content, font_cache[vw.font_url]) for vw in verse_words]
-
-
-def verse_words_load_fonts(
-    verse_words: List[VerseWord], font_size: int, font_cache: FontCache = {}
-):
-    for w in verse_words:
-        f = w.font_url
-        font_cache.setdefault(f, font_cache.get(f) or load_font(f, size=font_size))
-
-    return font_cache
-
-
-def time_step2frame_index(time_step_ms: float, fps: int):
-    return int(time_step_ms / 1000 * fps)
-
-
-def frame_index2time_step(index: int, fps: int):
-    return int(index / fps * 1000)
+from typing import List, Dict, Optional
+from hashlib import sha256
+import json
+
+from PIL.ImageFont import FreeTypeFont
+
+from .types import Renderer
+from .layout import Term
+from .fonts import FONTS
+from ..utilities import file_digest
+from ..verse.types import VerseWord, ClipInformation
+from ..verse.config import FONT_NAMESPACE
+
+FontCache = Dict[str, FreeTypeFont]
+
+
+def load_font(url: str, size: int, namespace: str = FONT_NAMESPACE):
+    return FONTS.font(url, size, namespace)
+
+
+def verse_word2terms(verse_words: List[VerseWord], font_cache: FontCache):
+    return [Term(vw.content, font_cache[vw.font_url]) for vw in verse_words]
+
+
+def verse_words_load_fonts(
+    verse_words: List[VerseWord], font_size: int
+) -> FontCache:
+    """the page font of every word at `font_size`, by url"""
+    return {w.font_url: load_font(w.font_url, font_size) for w in verse_words}
+
+
+def font_identity(font: FreeTypeFont):
+    # the file too, another font may be served under the same name
+    path = font.path if isinstance(font.path, str) else None
+    return [*font.getname(), font.size, path and file_digest(path)]
+
+
+def clip_digest(renderer: Renderer, clip: ClipInformation):
+    # the page font by content, `--font_dir` may serve another file for a url
+    key = {
+        "content": [
+            [w.content, w.translation, file_digest(FONTS.path(w.font_url))]
+            for w in clip.content
+        ],
+        "frame_size": renderer.frame_size,
+        "quran_font_size": renderer.quran_font_size,
+        "translation_font": font_identity(renderer.translation_font),
+    }
+
+    return sha256(json.dumps(key).encode()).hexdigest()
+
+
+def active_words(clip: ClipInformation, fps: int) -> Dict[int, Optional[int]]:
+    """
+    the word of `clip` active from every frame it changes at, or None; a word
+    stays active until the next one begins
+    """
+    changes: Dict[int, Optional[int]] = {}
+    for index, word in enumerate(clip.content):
+        changes[max(time_step2frame_index(word.begin - clip.begin, fps), 0)] = index
+
+    if clip.content:
+        last = max(changes)
+        end = time_step2frame_index(clip.content[-1].end - clip.begin, fps)
+        if end > last:
+            changes[end] = None
+
+    return changes
+
+
+def time_step2frame_index(time_step_ms: float, fps: int):
+    return int(time_step_ms / 1000 * fps)
+
+
+def frame_index2time_step(index: int, fps: int):
+    return int(index / fps * 1000)
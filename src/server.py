@@ -0,0 +1,468 @@
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from threading import Lock, Thread, local
+from queue import Queue, Full
+from uuid import uuid4
+import json
+import time
+import os
+
+import click
+from pydantic import BaseModel, PositiveInt, ValidationError
+
+from .main import SizeParam, VerseKeyParam, VerseKeyRange, expand_keys
+from .verse import prefetch_verses, get_reciter_config
+from .verse.types import VerseKey, page_font_urls
+from .renderer import Renderer
+from .renderer.glyphs import GLYPHS
+from .renderer.fonts import FONTS, configure_fonts
+from .renderer.pipelined import PIPELINE_STATS
+from .renderer.config import QURAN_FONT_SIZE
+from .renderer.transitions import TransitionName
+from .encoder import PROFILES, ENCODE_STATS
+from .utilities import CACHE, CACHE_DIR, configure_cache, concat_videos
+from .manifest import Manifest
+from .pipeline import (
+    RenderSettings,
+    Encoder,
+    load_verse,
+    render_verse,
+    verse_inputs,
+    verbose_echo,
+)
+
+JobStatus = Literal["queued", "running", "done", "failed"]
+
+# warm renderers kept by every worker, one per distinct output setting
+RENDERERS_PER_WORKER = 4
+# the settings a renderer is built from, the profile scales its frame and fonts
+RENDERER_SETTINGS = {
+    "height",
+    "width",
+    "fps",
+    "transition",
+    "highlight",
+    "encode_profile",
+}
+# finished jobs remembered for their status, the oldest are forgotten first
+FINISHED_JOBS = 256
+
+
+class JobRequest(BaseModel):
+    # the syntax of `--verse_key`, e.g. "1:1..1:7,2:255"
+    verse_key: str
+    reciter: str
+
+    resolution: str = "540x1080"
+    fps: PositiveInt = 30
+    transition: TransitionName = "fade"
+    highlight: bool = False
+
+    encoder: Encoder = "ffmpeg"
+    encode_profile: str = "default"
+
+
+class Job:
+    def __init__(
+        self,
+        id: str,
+        request: JobRequest,
+        settings: RenderSettings,
+        verse_key: List[VerseKeyRange],
+    ):
+        self.id = id
+        self.request = request
+        self.settings = settings
+        self.verse_key = verse_key
+
+        self.status: JobStatus = "queued"
+        self.keys: List[VerseKey] = []
+        self.current: Optional[str] = None
+        self.done = 0
+        self.errors: List[str] = []
+
+        self.frames = 0
+        self.encode_seconds = 0.0
+
+        # unix time
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+
+    @property
+    def output(self) -> str:
+        return os.path.join(self.settings.dist, "output.mp4")
+
+    def summary(self) -> Dict[str, Any]:
+        elapsed = None
+        if self.started is not None:
+            elapsed = (self.finished or time.time()) - self.started
+
+        return {
+            "id": self.id,
+            "status": self.status,
+            "request": self.request.model_dump(),
+            "progress": {
+                "verses": len(self.keys),
+                "done": self.done,
+                "failed": len(self.errors),
+                "current": self.current,
+            },
+            "frames": self.frames,
+            "encode_seconds": round(self.encode_seconds, 3),
+            "elapsed_seconds": None if elapsed is None else round(elapsed, 3),
+            "frames_per_second": (
+                round(self.frames / elapsed, 3) if elapsed else None
+            ),
+            "errors": self.errors,
+            "output": self.output if self.status == "done" else None,
+        }
+
+
+class RenderQueue:
+    """
+    render jobs on a pool of worker threads, fed by a bounded queue; a worker
+    keeps its renderers (and their loaded fonts) warm across jobs
+    """
+
+    def __init__(self, dist: str, workers: int, capacity: int, **settings) -> None:
+        self.dist = dist
+        # cache_dir, cache_size, offline and font_dir of every `RenderSettings`
+        self.settings = settings
+
+        self.queue: "Queue[Job]" = Queue(maxsize=capacity)
+        self.jobs: Dict[str, Job] = {}
+        self.lock = Lock()
+
+        self.started = time.time()
+        self.busy = 0
+        self.verses = 0
+
+        self._local = local()
+        self.workers = [
+            Thread(target=self.work, name=f"render-{index}", daemon=True)
+            for index in range(workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, request: JobRequest) -> Job:
+        """queue a job, `queue.Full` when too many are waiting already"""
+        resolution = SizeParam().convert(request.resolution, None, None)
+        if request.encode_profile not in PROFILES:
+            raise ValueError(f"unknown encode profile '{request.encode_profile}'")
+
+        reciter = get_reciter_config(request.reciter)
+        verse_key = VerseKeyParam().convert(request.verse_key, None, None)
+
+        job_id = uuid4().hex[:12]
+        settings = RenderSettings(
+            dist=os.path.join(self.dist, job_id),
+            height=resolution.height,
+            width=resolution.width,
+            fps=request.fps,
+            reciter=reciter,
+            transition=request.transition,
+            highlight=request.highlight,
+            encoder=request.encoder,
+            encode_profile=PROFILES[request.encode_profile],
+            **self.settings,
+        )
+        job = Job(job_id, request, settings, verse_key)
+        # the verses are loaded by the worker, not while the client waits
+        job.keys = [
+            VerseKey(chapter_id=k.start[0], verse_id=verse_id)
+            for k in verse_key
+            for verse_id in range(k.start[1], k.end[1] + 1)
+        ]
+
+        with self.lock:
+            # nothing is left behind by a refused job
+            self.queue.put_nowait(job)
+            self.jobs[job.id] = job
+            self.forget_finished()
+
+        return job
+
+    def forget_finished(self):
+        """drop the oldest finished jobs past `FINISHED_JOBS`, holding the lock"""
+        finished = [
+            job.id for job in self.jobs.values() if job.status in ("done", "failed")
+        ]
+        for job_id in finished[: max(len(finished) - FINISHED_JOBS, 0)]:
+            del self.jobs[job_id]
+
+    def renderer(self, settings: RenderSettings) -> Renderer:
+        """a renderer of this worker thread for `settings`, built once"""
+        renderers: Dict[str, Renderer] = self._local.__dict__.setdefault(
+            "renderers", {}
+        )
+        key = settings.model_dump_json(include=RENDERER_SETTINGS)
+        if key not in renderers:
+            if len(renderers) >= RENDERERS_PER_WORKER:
+                renderers.pop(next(iter(renderers)))
+            renderers[key] = settings.renderer()
+
+        return renderers[key]
+
+    def work(self):
+        while True:
+            job = self.queue.get()
+            with self.lock:
+                self.busy += 1
+            try:
+                self.run(job)
+            except Exception as e:
+                job.errors.append(str(e))
+                job.status = "failed"
+            finally:
+                job.current = None
+                job.finished = time.time()
+                with self.lock:
+                    self.busy -= 1
+                self.queue.task_done()
+
+    def run(self, job: Job):
+        settings = job.settings
+        job.status = "running"
+        job.started = time.time()
+
+        os.makedirs(settings.dist, exist_ok=True)
+        # ranges in a few requests, then the downloads of every verse
+        expand_keys(job.verse_key, settings.reciter)
+        prefetch_verses(job.keys, settings.reciter)
+
+        renderer = self.renderer(settings)
+        # the record of the job on disk, as with the command line
+        manifest = Manifest()
+
+        videos: List[str] = []
+        for key in job.keys:
+            job.current = str(key)
+            frames, seconds = ENCODE_STATS.thread_totals()
+
+            inputs = {}
+            try:
+                verse_info = load_verse(key, settings.reciter)
+                inputs = verse_inputs(settings, verse_info)
+                filename = render_verse(
+                    renderer,
+                    verse_info,
+                    settings.dist,
+                    encoder=settings.encoder,
+                    profile=settings.encode_profile,
+                    progress=False,
+                )
+            except Exception as e:
+                job.errors.append(f"key '{key}' failed: {e}")
+                manifest.failed(str(key), inputs, str(e))
+            else:
+                videos.append(filename)
+                manifest.done(str(key), inputs, filename)
+                job.done += 1
+                with self.lock:
+                    self.verses += 1
+            finally:
+                manifest.save(settings.dist)
+
+                written, spent = ENCODE_STATS.thread_totals()
+                job.frames += written - frames
+                job.encode_seconds += spent - seconds
+
+        job.current = None
+        if videos:
+            concat_videos(job.output, videos)
+        job.status = "done" if videos else "failed"
+
+    def metrics(self) -> Dict[str, Any]:
+        with self.lock:
+            jobs = list(self.jobs.values())
+            busy, verses = self.busy, self.verses
+
+        statuses: Dict[str, int] = {}
+        for job in jobs:
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+
+        uptime = time.time() - self.started
+        return {
+            "uptime_seconds": round(uptime, 3),
+            "workers": {"total": len(self.workers), "busy": busy},
+            "queue": {"depth": self.queue.qsize(), "capacity": self.queue.maxsize},
+            "jobs": statuses,
+            "verses": verses,
+            "frames": ENCODE_STATS.frames,
+            "encode_seconds": round(ENCODE_STATS.seconds, 3),
+            "frames_per_second": round(ENCODE_STATS.frames / uptime, 3),
+            "cache": {"hits": CACHE.hits, "misses": CACHE.misses},
+            "glyphs": {"hits": GLYPHS.hits, "misses": GLYPHS.misses},
+            "fonts": FONTS.stats(),
+            "pipeline": PIPELINE_STATS.summary(),
+        }
+
+
+class Handler(BaseHTTPRequestHandler):
+    """
+    POST /jobs          queue a `JobRequest`
+    GET  /jobs          every job
+    GET  /jobs/<id>     one job and its progress
+    GET  /metrics       queue, worker and throughput numbers
+    """
+
+    server: "RenderServer"
+
+    def reply(self, status: int, body: Any, headers: Tuple = ()):
+        data = json.dumps(body, indent=2).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in headers:
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        queue = self.server.queue
+        path = self.path.rstrip("/")
+
+        if path == "/metrics":
+            return self.reply(200, queue.metrics())
+        if path == "/jobs":
+            with queue.lock:
+                jobs = list(queue.jobs.values())
+            return self.reply(200, [job.summary() for job in jobs])
+        if path.startswith("/jobs/"):
+            job = queue.jobs.get(path[len("/jobs/") :])
+            if job is not None:
+                return self.reply(200, job.summary())
+
+        self.reply(404, {"error": f"'{self.path}' not found"})
+
+    def do_POST(self):
+        if self.path.rstrip("/") != "/jobs":
+            return self.reply(404, {"error": f"'{self.path}' not found"})
+
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            request = JobRequest.model_validate_json(self.rfile.read(length))
+            job = self.server.queue.submit(request)
+        except Full:
+            return self.reply(
+                503, {"error": "the render queue is full"}, (("Retry-After", "30"),)
+            )
+        except (ValidationError, ValueError, click.ClickException) as e:
+            message = e.format_message() if isinstance(e, click.ClickException) else e
+            return self.reply(400, {"error": str(message)})
+
+        self.reply(202, job.summary(), (("Location", f"/jobs/{job.id}"),))
+
+    def log_message(self, format: str, *args):
+        verbose_echo(self.server.verbose, format % args)
+
+
+class RenderServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, queue: RenderQueue, verbose: bool = False) -> None:
+        super().__init__(address, Handler)
+        self.queue = queue
+        self.verbose = verbose
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", help="interface to listen on")
+@click.option("--port", default=8765, help="port to listen on", type=int)
+@click.option(
+    "--dist",
+    default="dist",
+    help="where to store the videos, a directory per job",
+    type=click.Path(file_okay=False),
+)
+@click.option(
+    "--workers",
+    default=2,
+    help="how many jobs to render at once",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--queue_size",
+    default=16,
+    help="how many jobs may wait for a worker, more are refused",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--cache_dir",
+    default=CACHE_DIR,
+    help="where to cache downloaded verses, recitations and fonts",
+    type=click.Path(file_okay=False),
+)
+@click.option(
+    "--cache_size",
+    default=2048,
+    help="maximum size of the download cache in megabytes",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    help="never touch the network, only use cached downloads",
+)
+@click.option(
+    "--font_dir",
+    default=None,
+    help="directory of local page fonts (p1.ttf, ...) used instead of downloads",
+    type=click.Path(exists=True, file_okay=False),
+)
+@click.option(
+    "--preload_fonts",
+    is_flag=True,
+    default=False,
+    help="load every page font of the Mushaf before accepting jobs",
+)
+@click.option("-v/-q", "--verbose/--quiet", default=False, help="log every request")
+def serve(
+    host: str,
+    port: int,
+    dist: str,
+    workers: int,
+    queue_size: int,
+    cache_dir: str,
+    cache_size: int,
+    offline: bool,
+    font_dir: Optional[str],
+    preload_fonts: bool,
+    verbose: bool,
+):
+    """render verses for jobs posted to a local HTTP/JSON API"""
+    os.makedirs(dist, exist_ok=True)
+    configure_cache(cache_dir, cache_size * 1024**2, offline)
+    configure_fonts(font_dir)
+    if preload_fonts:
+        # at the size of every profile, as `RenderSettings.renderer` scales it
+        sizes = {round(QURAN_FONT_SIZE * p.scale) for p in PROFILES.values()}
+        for size in sorted(sizes):
+            fonts = FONTS.preload(page_font_urls(), size)
+        click.echo(f"loaded {len(fonts)} page fonts at sizes {sorted(sizes)}")
+
+    queue = RenderQueue(
+        dist,
+        workers,
+        queue_size,
+        cache_dir=cache_dir,
+        cache_size=cache_size * 1024**2,
+        offline=offline,
+        font_dir=font_dir,
+    )
+    server = RenderServer((host, port), queue, verbose=verbose)
+
+    click.echo(f"listening on http://{host}:{port} with {workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    serve()
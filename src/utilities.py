@@ -1,22 +1,342 @@
-from io import BytesIO
-import os
-
-from requests import get
-
-
-def GET(url: str, **kwargs):
-    response = get(url, **kwargs)
-    response.raise_for_status()
-
-    return response
-
-
-def virtual_io(url: str, **kwargs):
-    return BytesIO(GET(url=url, **kwargs).content)
-
-
-def merge_audio_and_video(out_filename: str, audio_filename: str, video_filename: str):
-    os.system(
-        "ffmpeg -i %s -i %s -c:v libx264 -c:a aac -y -loglevel error %s"
-        % (audio_filename, video_filename, out_filename)
-    )
+from typing import Optional, Dict, Tuple, Iterable, Sequence
+from concurrent.futures import ThreadPoolExecutor, Future, wait
+from hashlib import sha256
+from io import BytesIO
+from threading import Lock, get_ident
+import subprocess
+import tempfile
+import os
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+from .profiling import PROFILER
+from .config import CACHE_DIR, CACHE_MAX_SIZE
+from .encoder.config import FFMPEG
+
+
+PREFETCH_WORKERS = 8
+
+# how long a fetch waits on the prefetch of its url before fetching it itself
+PREFETCH_WAIT_SECONDS = 60
+
+# bytes per write of a streamed download
+DOWNLOAD_CHUNK = 1 << 16
+
+
+class DiskCache:
+    def __init__(
+        self,
+        directory: str = CACHE_DIR,
+        max_size: int = CACHE_MAX_SIZE,
+        offline: bool = False,
+    ) -> None:
+        self.directory = directory
+        self.max_size = max_size
+        self.offline = offline
+
+        self.hits = 0
+        self.misses = 0
+
+        self._size: Optional[int] = None
+        self._lock = Lock()
+
+    def key(self, url: str, namespace: str = "") -> str:
+        return sha256(f"{namespace}\n{url}".encode()).hexdigest()
+
+    def path(self, url: str, namespace: str = "") -> str:
+        key = self.key(url, namespace)
+        return os.path.join(self.directory, key[:2], key)
+
+    def contains(self, url: str, namespace: str = "") -> bool:
+        return os.path.exists(self.path(url, namespace))
+
+    def touch(self, url: str, namespace: str = "") -> Optional[str]:
+        """path of a cached entry, marked as recently used"""
+        path = self.path(url, namespace)
+        try:
+            # the modification time doubles as the LRU clock
+            os.utime(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return path
+
+    def get(self, url: str, namespace: str = "") -> Optional[bytes]:
+        path = self.touch(url, namespace)
+        if path is None:
+            return None
+
+        with open(path, "rb") as f:
+            return f.read()
+
+    def put(self, url: str, data: bytes, namespace: str = ""):
+        return self.put_stream(url, [data], namespace)
+
+    def put_stream(self, url: str, chunks: Iterable[bytes], namespace: str = ""):
+        path = self.path(url, namespace)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        size = 0
+        temp = f"{path}.{os.getpid()}.{get_ident()}.tmp"
+        with open(temp, "wb") as f:
+            for chunk in chunks:
+                f.write(chunk)
+                size += len(chunk)
+        os.replace(temp, path)
+
+        with self._lock:
+            if self._size is not None:
+                self._size += size
+            self.evict()
+
+        return size
+
+    def delete(self, url: str, namespace: str = ""):
+        """forget an entry, e.g. a response its reader rejected"""
+        path = self.path(url, namespace)
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except FileNotFoundError:
+            return
+
+        with self._lock:
+            if self._size is not None:
+                self._size -= size
+
+    def entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                yield path, stat.st_size, stat.st_mtime
+
+    def size(self) -> int:
+        if self._size is None:
+            self._size = sum(size for _, size, _ in self.entries())
+        return self._size
+
+    def evict(self):
+        if self.size() <= self.max_size:
+            return
+
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        self._size = sum(size for _, size, _ in entries)
+
+        for path, size, _ in entries:
+            if self._size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # open elsewhere, e.g. a mapped font on windows
+                continue
+            self._size -= size
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": self.size(),
+            "max_size": self.max_size,
+        }
+
+
+CACHE = DiskCache()
+
+
+def configure_cache(
+    directory: str = CACHE_DIR, max_size: int = CACHE_MAX_SIZE, offline: bool = False
+):
+    CACHE.__init__(directory=directory, max_size=max_size, offline=offline)
+
+    return CACHE
+
+
+def _session():
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=PREFETCH_WORKERS)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
+SESSION = _session()
+
+
+def GET(url: str, **kwargs):
+    response = SESSION.get(url, **kwargs)
+    response.raise_for_status()
+
+    return response
+
+
+def _fetch(url: str, namespace: str = "", cache: bool = True, **kwargs) -> bytes:
+    data = CACHE.get(url, namespace) if cache else None
+    if data is not None:
+        return data
+
+    if CACHE.offline:
+        raise RuntimeError(f"'{url}' is not cached and offline mode is enabled.")
+
+    with PROFILER.stage("download", url=url):
+        data = GET(url=url, **kwargs).content
+    if cache:
+        CACHE.put(url, data, namespace)
+    PROFILER.count("bytes_downloaded", len(data))
+
+    return data
+
+
+class Prefetcher:
+    def __init__(self, max_workers: int = PREFETCH_WORKERS) -> None:
+        self.max_workers = max_workers
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._closed = False
+        self._pending: Dict[Tuple[str, str], Future] = {}
+        self._lock = Lock()
+
+    def _download(self, url: str, namespace: str):
+        # only populate the cache, holding every prefetched body would defeat it
+        _fetch(url, namespace)
+
+    def submit(self, url: str, namespace: str = "") -> Future:
+        key = (url, namespace)
+
+        with self._lock:
+            future = self._pending.get(key)
+            if future is not None:
+                return future
+
+            if self._closed or CACHE.offline or CACHE.contains(url, namespace):
+                future = Future()
+                future.set_result(None)
+                return future
+
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="prefetch"
+                )
+
+            future = self._executor.submit(self._download, url, namespace)
+            self._pending[key] = future
+
+        future.add_done_callback(lambda _: self._done(key))
+        return future
+
+    def _done(self, key: Tuple[str, str]):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def pending(self, url: str, namespace: str = "") -> Optional[Future]:
+        with self._lock:
+            return self._pending.get((url, namespace))
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._closed = True
+            self._pending.clear()
+
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+PREFETCHER = Prefetcher()
+
+
+def fetch(url: str, namespace: str = "", cache: bool = True, **kwargs) -> bytes:
+    """`cache=False` skips the cache, for responses stored in another shape"""
+    future = PREFETCHER.pending(url, namespace)
+    if future is not None:
+        # a failed or stuck prefetch is retried (and reported) by `_fetch` below
+        wait([future], timeout=PREFETCH_WAIT_SECONDS)
+
+    return _fetch(url, namespace, cache, **kwargs)
+
+
+def fetch_file(url: str, namespace: str = "", **kwargs) -> str:
+    """path of the cached download, streamed to disk instead of held in memory"""
+    future = PREFETCHER.pending(url, namespace)
+    if future is not None:
+        wait([future], timeout=PREFETCH_WAIT_SECONDS)
+
+    path = CACHE.touch(url, namespace)
+    if path is not None:
+        return path
+
+    if CACHE.offline:
+        raise RuntimeError(f"'{url}' is not cached and offline mode is enabled.")
+
+    with PROFILER.stage("download", url=url):
+        with GET(url=url, stream=True, **kwargs) as response:
+            chunks = response.iter_content(DOWNLOAD_CHUNK)
+            size = CACHE.put_stream(url, chunks, namespace)
+    PROFILER.count("bytes_downloaded", size)
+
+    return CACHE.path(url, namespace)
+
+
+# sha256 by path, cached files are never rewritten in place
+_DIGESTS: Dict[str, str] = {}
+
+
+def file_digest(filename: str) -> str:
+    digest = _DIGESTS.get(filename)
+    if digest is None:
+        hasher = sha256()
+        with open(filename, "rb") as f:
+            for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK), b""):
+                hasher.update(chunk)
+        digest = _DIGESTS[filename] = hasher.hexdigest()
+
+    return digest
+
+
+def virtual_io(url: str, namespace: str = "", **kwargs):
+    return BytesIO(fetch(url=url, namespace=namespace, **kwargs))
+
+
+def merge_audio_and_video(
+    out_filename: str,
+    audio_filename: str,
+    video_filename: str,
+    audio_trim: Optional[Tuple[float, float]] = None,
+    video_args: Sequence[str] = ("-c:v", "libx264"),
+):
+    command = [FFMPEG, "-y", "-loglevel", "error"]
+    if audio_trim is not None:
+        command += ["-ss", f"{audio_trim[0]:.3f}", "-to", f"{audio_trim[1]:.3f}"]
+    command += ["-i", audio_filename, "-i", video_filename, *video_args]
+    command += ["-c:a", "aac", out_filename]
+
+    if subprocess.call(command) != 0:
+        raise RuntimeError(f"ffmpeg failed to mux '{out_filename}'")
+
+
+def concat_videos(out_filename: str, video_filenames: Sequence[str]):
+    """join videos of the same format without re-encoding them"""
+    fd, listing = tempfile.mkstemp(suffix=".txt", prefix="visual-tilawa-")
+    with os.fdopen(fd, "w") as f:
+        f.writelines([f"file '{os.path.abspath(v)}'\n" for v in video_filenames])
+    try:
+        command = [FFMPEG, "-y", "-loglevel", "error"]
+        command += ["-f", "concat", "-safe", "0", "-i", listing, "-c", "copy"]
+        returncode = subprocess.call(command + [out_filename])
+    finally:
+        os.remove(listing)
+
+    if returncode != 0:
+        raise RuntimeError(f"ffmpeg failed to join the videos into '{out_filename}'")
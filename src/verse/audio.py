@@ -0,0 +1,273 @@
+from typing import List, Optional, Tuple
+import subprocess
+import tempfile
+import struct
+import math
+import os
+
+import numpy as np
+
+from ..encoder.config import FFMPEG
+
+
+SAMPLE_TYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+# frames squared and summed per block, bounds the temporary arrays
+ENERGY_BLOCK = 1 << 20
+
+
+def segment_samples(audio) -> np.ndarray:
+    """(frames, channels) view of the samples of a pydub `AudioSegment`"""
+    samples = np.frombuffer(audio.raw_data, dtype=SAMPLE_TYPES[audio.sample_width])
+    return samples.reshape(-1, audio.channels)
+
+
+class PCMAudio:
+    """
+    decoded samples memory-mapped from a WAV file on disk, only the pages in use
+    are resident; `source` is the compressed original, for the muxer
+    """
+
+    def __init__(
+        self,
+        source: str,
+        samples: np.ndarray,
+        frame_rate: int,
+        sample_width: int,
+        temp: Optional[str] = None,
+        span: Optional[Tuple[int, int]] = None,
+        compressed: bool = False,
+    ) -> None:
+        self.source = source
+        self.samples = samples
+        self.frame_rate = frame_rate
+        self.sample_width = sample_width
+        # decoded file owned by this object, removed by `close`
+        self.temp = temp
+        # (begin, end) in milliseconds of `source`, when only a part of it
+        self.span = span
+        # whether `source` is an encoded (e.g. MP3) file rather than a WAV one
+        self.compressed = compressed
+
+    @classmethod
+    def decode(cls, source: str) -> "PCMAudio":
+        """map `source` directly if it is a PCM WAV file, decode it to one otherwise"""
+        header = wav_header(source)
+        if header is not None:
+            return cls.map(source, source, *header)
+
+        fd, temp = tempfile.mkstemp(prefix="visual-tilawa-", suffix=".wav")
+        os.close(fd)
+
+        command = [FFMPEG, "-y", "-loglevel", "error", "-i", source]
+        command += ["-vn", "-f", "wav", "-acodec", "pcm_s16le", temp]
+        header = wav_header(temp) if subprocess.call(command) == 0 else None
+        if header is None:
+            os.remove(temp)
+            raise RuntimeError(f"ffmpeg failed to decode '{source}'")
+
+        audio = cls.map(source, temp, *header, temp=temp)
+        audio.compressed = True
+        return audio
+
+    @classmethod
+    def map(
+        cls,
+        source: str,
+        filename: str,
+        frame_rate: int,
+        channels: int,
+        sample_width: int,
+        offset: int,
+        frames: int,
+        temp: Optional[str] = None,
+    ) -> "PCMAudio":
+        dtype = SAMPLE_TYPES[sample_width]
+        if frames:
+            samples = np.memmap(
+                filename, dtype=dtype, mode="r", offset=offset, shape=(frames, channels)
+            )
+        else:
+            samples = np.zeros((0, channels), dtype=dtype)
+
+        return cls(source, samples, frame_rate, sample_width, temp=temp)
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def frame_width(self) -> int:
+        return self.channels * self.sample_width
+
+    @property
+    def duration_ms(self) -> int:
+        return round(1000 * len(self.samples) / self.frame_rate)
+
+    @property
+    def dBFS(self) -> float:
+        return audio_dbfs(self.samples, self.sample_width)
+
+    def frame_index(self, ms: float) -> int:
+        return int(ms * self.frame_rate / 1000.0)
+
+    def slice(self, begin: int, end: int) -> "PCMAudio":
+        """a view from `begin` to `end` milliseconds, nothing is copied"""
+        samples = self.samples[self.frame_index(begin) : self.frame_index(end)]
+
+        offset = self.span[0] if self.span is not None else 0
+        span = (offset + begin, offset + min(end, self.duration_ms))
+        return PCMAudio(
+            self.source, samples, self.frame_rate, self.sample_width, span=span
+        )
+
+    def segment(self):
+        """the samples as a pydub `AudioSegment`, held in memory"""
+        from pydub import AudioSegment
+
+        return AudioSegment(
+            np.ascontiguousarray(self.samples).tobytes(),
+            frame_rate=self.frame_rate,
+            sample_width=self.sample_width,
+            channels=self.channels,
+        )
+
+    def close(self):
+        self.samples = np.zeros((0, self.channels), dtype=self.samples.dtype)
+        if self.temp is not None:
+            os.remove(self.temp)
+            self.temp = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def wav_header(filename: str) -> Optional[Tuple[int, int, int, int, int]]:
+    """(frame rate, channels, sample width, data offset, frames) of a PCM WAV file"""
+    with open(filename, "rb") as f:
+        if f.read(4) != b"RIFF" or f.read(8)[4:] != b"WAVE":
+            return None
+
+        size = os.fstat(f.fileno()).st_size
+        fmt = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            name, length = struct.unpack("<4sI", chunk)
+
+            if name == b"fmt ":
+                fmt = struct.unpack("<HHIIHH", f.read(16))
+                f.seek(length - 16 + length % 2, os.SEEK_CUR)
+            elif name == b"data" and fmt is not None:
+                tag, channels, frame_rate, _, _, bits = fmt
+                # 8 bit WAV samples are unsigned, leave those to ffmpeg
+                if tag != 1 or bits // 8 not in (2, 4):
+                    return None
+
+                offset = f.tell()
+                # streamed writers may leave the length unset
+                length = min(length, size - offset)
+                frames = length // (channels * bits // 8)
+                return frame_rate, channels, bits // 8, offset, frames
+            else:
+                f.seek(length + length % 2, os.SEEK_CUR)
+
+
+def max_amplitude(sample_width: int) -> float:
+    return 2 ** (sample_width * 8) / 2
+
+
+def cumulative_energy(samples: np.ndarray, boundaries: np.ndarray) -> np.ndarray:
+    """sum of squared samples of every frame before each of the `boundaries`"""
+    frames = len(samples)
+    boundaries = np.minimum(boundaries, frames)
+
+    # exact for 8/16 bit audio, wider samples may overflow int64
+    dtype = np.int64 if samples.itemsize <= 2 else np.float64
+    result = np.zeros(len(boundaries), dtype=dtype)
+
+    carry = 0
+    for start in range(0, frames, ENERGY_BLOCK):
+        block = samples[start : start + ENERGY_BLOCK].astype(dtype)
+        energy = np.cumsum(np.einsum("ij,ij->i", block, block)) + carry
+
+        stop = start + len(block)
+        lo = np.searchsorted(boundaries, start, side="right")
+        hi = np.searchsorted(boundaries, stop, side="right")
+        result[lo:hi] = energy[boundaries[lo:hi] - start - 1]
+
+        carry = energy[-1]
+
+    return result
+
+
+def rms(energy, count):
+    """`audioop.rms`: the truncated root mean square"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(count > 0, np.floor(np.sqrt(energy / count)), 0)
+
+
+def audio_dbfs(samples: np.ndarray, sample_width: int) -> float:
+    """`AudioSegment.dBFS` of the samples"""
+    frames, channels = samples.shape
+    energy = cumulative_energy(samples, np.array([frames]))[0]
+
+    value = rms(np.float64(energy), frames * channels)
+    if value == 0:
+        return -float("inf")
+    return 20 * math.log(value / max_amplitude(sample_width), 10)
+
+
+def detect_silence(
+    samples: np.ndarray,
+    frame_rate: int,
+    sample_width: int,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    seek_step: int = 1,
+) -> List[List[int]]:
+    """
+    `pydub.silence.detect_silence` over a (frames, channels) sample array:
+    the RMS of every window comes from a cumulative sum of per millisecond
+    energies, instead of slicing the audio once per millisecond
+    """
+    frames, channels = samples.shape
+    seg_len = round(1000 * frames / frame_rate)
+
+    if seg_len < min_silence_len:
+        return []
+
+    threshold = 10 ** (silence_thresh / 20) * max_amplitude(sample_width)
+
+    # the frame pydub slices at for every millisecond
+    boundaries = (np.arange(seg_len + 1) * (frame_rate / 1000.0)).astype(np.int64)
+    energy = cumulative_energy(samples, boundaries)
+
+    last_slice_start = seg_len - min_silence_len
+    starts = np.arange(0, last_slice_start + 1, seek_step)
+    if last_slice_start % seek_step:
+        starts = np.append(starts, last_slice_start)
+    ends = np.minimum(starts + min_silence_len, seg_len)
+
+    # short windows at the very end are padded with silence by pydub
+    count = (boundaries[ends] - boundaries[starts]) * channels
+    levels = rms((energy[ends] - energy[starts]).astype(np.float64), count)
+
+    silence_starts = starts[levels <= threshold]
+    if not len(silence_starts):
+        return []
+
+    gaps = np.diff(silence_starts)
+    breaks = np.flatnonzero((gaps != seek_step) & (gaps > min_silence_len))
+
+    range_starts = silence_starts[np.concatenate([[0], breaks + 1])]
+    range_ends = silence_starts[np.concatenate([breaks, [len(silence_starts) - 1]])]
+
+    return [
+        [int(begin), int(end) + min_silence_len]
+        for begin, end in zip(range_starts, range_ends)
+    ]
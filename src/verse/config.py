@@ -1 +1,31 @@
-CODE_VERSION = 1
+CODE_VERSION = 1
+
+FONT_NAMESPACE = f"font/v{CODE_VERSION}"
+# a font per page of the Madani Mushaf
+MUSHAF_PAGES = 604
+
+# verses per request of the paginated `verses/by_chapter` endpoint, its maximum
+CHAPTER_PAGE_SIZE = 50
+
+# quran.com recitation ids by reciter name
+RECITERS = {
+    "AbdulBaset AbdulSamad": 1,
+    "Abdur-Rahman as-Sudais": 2,
+    "Abu Bakr al-Shatri": 3,
+    "Hani ar-Rifai": 4,
+    "Mahmoud Khalil Al-Husary": 5,
+    "Mishari Rashid al-`Afasy": 6,
+    "Mohamed Siddiq al-Minshawi": 7,
+    "Sa'ud ash-Shuraim": 8,
+    "Khalifah Al Tunaiji": 11,
+    "Sa'ad al-Ghamdi": 12,
+    "Yasser Ad Dussary": 20,
+    "Ahmed ibn Ali al-Ajmy": 22,
+    "Abdullah Ali Jabir": 23,
+    "Bandar Baleela": 24,
+    "Maher al-Muaiqly": 25,
+    "Abdullah Hamad Abu Sharida": 26,
+}
+
+# word by word translations of quran.com
+TRANSLATION_LANGUAGES = ["ur", "en", "id", "bn", "tr", "fa", "ru", "hi", "de", "inh"]
@@ -0,0 +1,355 @@
+from typing import Dict, List, Iterable
+import json
+
+from .types import (
+    VerseInformation,
+    ClipInformation,
+    VerseWord,
+    VerseTiming,
+    ChapterRecitation,
+    VerseKey,
+    Reciter,
+    TranslationLanguage,
+)
+from .utilities import (
+    get_reciter_config,
+    group_words,
+    verse_url,
+    chapter_url,
+    chapter_recitation_url,
+    chapter_pages,
+    verse_namespace,
+    audio_namespace,
+)
+from ..utilities import fetch, fetch_file, CACHE, PREFETCHER
+from .config import CODE_VERSION, FONT_NAMESPACE
+from .audio import PCMAudio, detect_silence
+
+
+def fetch_json(url: str, namespace: str, **kwargs):
+    """the decoded response of `url`, None when it is not JSON"""
+    try:
+        return json.loads(fetch(url, namespace=namespace, **kwargs))
+    except ValueError:
+        return None
+
+
+def rejected(url: str, namespace: str, message: str) -> RuntimeError:
+    """
+    the error of an unusable response, dropped from the cache so the next
+    attempt requests it again
+    """
+    CACHE.delete(url, namespace)
+    return RuntimeError(message)
+
+
+def verse_info_by_key(
+    key: VerseKey, reciter: Reciter, lang: TranslationLanguage = "en"
+):
+    url = verse_url(key, reciter, lang)
+    namespace = verse_namespace(reciter)
+    raw = fetch_json(url, namespace)
+
+    if not isinstance(raw, dict) or raw.get("error") is not None:
+        raise rejected(url, namespace, "Error fetching verse raw information.")
+
+    return parse_verse(raw["verse"], key, reciter)
+
+
+def verses_info_by_range(
+    start: VerseKey,
+    end: VerseKey,
+    reciter: Reciter,
+    lang: TranslationLanguage = "en",
+):
+    """
+    the verses from `start` to `end` of one chapter, uncached ones come from a
+    few paginated `verses/by_chapter` requests; every verse is then cached
+    where `verse_info_by_key` looks for it
+    """
+    chapter_id = start.chapter_id
+    keys = [
+        VerseKey(chapter_id=chapter_id, verse_id=verse_id)
+        for verse_id in range(start.verse_id, end.verse_id + 1)
+    ]
+
+    namespace = verse_namespace(reciter)
+    missing = [
+        key.verse_id
+        for key in keys
+        if not CACHE.contains(verse_url(key, reciter, lang), namespace)
+    ]
+
+    for page in chapter_pages(missing):
+        url = chapter_url(chapter_id, page, reciter, lang)
+        raw = fetch_json(url, namespace, cache=False)
+
+        if not isinstance(raw, dict) or raw.get("error") is not None:
+            raise RuntimeError("Error fetching chapter raw information.")
+
+        for verse_data in raw["verses"]:
+            c, v = map(int, verse_data["verse_key"].split(":"))
+            key = VerseKey(chapter_id=c, verse_id=v)
+            data = json.dumps({"verse": verse_data}).encode()
+            CACHE.put(verse_url(key, reciter, lang), data, namespace)
+
+    return [verse_info_by_key(key, reciter, lang) for key in keys]
+
+
+def parse_verse(verse_data: dict, key: VerseKey, reciter: Reciter):
+    audio_data = verse_data["audio"]
+    audio_segments = audio_data["segments"]
+
+    SEG_BEGIN, SEG_END = 2, 3
+
+    content: List[VerseWord] = []
+    for raw_word in verse_data["words"]:
+        position = raw_word["position"] - 1
+        segment = (
+            audio_segments[-1]
+            if position >= len(audio_segments)
+            else audio_segments[position]
+        )
+
+        # FIXME: I DONT WANT TO DO THIS!
+        if raw_word["char_type_name"] != "word":
+            continue  # Ignore non-words (e.g. AyahNumber)
+
+        content.append(
+            VerseWord(
+                translation=raw_word["translation"]["text"],
+                code_page=raw_word[f"v{CODE_VERSION}_page"],
+                content=raw_word[f"code_v{CODE_VERSION}"],
+                spell_audio_path=raw_word["audio_url"],
+                position=raw_word["position"],
+                begin=segment[SEG_BEGIN],
+                end=segment[SEG_END],
+            )
+        )
+
+    return VerseInformation(
+        audio_path=audio_data["url"], verse_key=key, content=content, reciter=reciter
+    )
+
+
+# chapter recitations by (chapter, reciter id)
+_RECITATIONS: Dict[tuple, ChapterRecitation] = {}
+# the decoded chapter recitation shared by its verses, by file path
+_DECODED: Dict[str, PCMAudio] = {}
+
+
+def chapter_recitation(chapter_id: int, reciter: Reciter) -> ChapterRecitation:
+    """the audio file of a whole chapter with the timings of its verses"""
+    recitation = _RECITATIONS.get((chapter_id, reciter.id))
+    if recitation is not None:
+        return recitation
+
+    url = chapter_recitation_url(chapter_id, reciter)
+    namespace = verse_namespace(reciter)
+    raw = fetch_json(url, namespace)
+
+    if not isinstance(raw, dict) or raw.get("audio_file") is None:
+        message = "Error fetching chapter recitation information."
+        raise rejected(url, namespace, message)
+
+    audio_file = raw["audio_file"]
+    timings: Dict[str, VerseTiming] = {}
+    for timestamp in audio_file["timestamps"]:
+        timings[timestamp["verse_key"]] = VerseTiming(
+            begin=timestamp["timestamp_from"],
+            end=timestamp["timestamp_to"],
+            # (position, begin, end), sometimes with a leading word index
+            segments=[
+                (segment[-3], segment[-2], segment[-1])
+                for segment in timestamp["segments"]
+                if len(segment) >= 3
+            ],
+        )
+
+    recitation = ChapterRecitation(
+        chapter_id=chapter_id, audio_path=audio_file["audio_url"], timings=timings
+    )
+    _RECITATIONS[(chapter_id, reciter.id)] = recitation
+
+    return recitation
+
+
+def with_chapter_audio(verse: VerseInformation, recitation: ChapterRecitation):
+    """`verse` timed within the chapter recitation instead of its own file"""
+    timing = recitation.timings.get(str(verse.verse_key))
+    if timing is None:
+        raise RuntimeError(f"no timing for verse {verse.verse_key} in its chapter.")
+
+    segments = {position: (begin, end) for position, begin, end in timing.segments}
+    content: List[VerseWord] = []
+    for word in verse.content:
+        segment = segments.get(word.position)
+        if segment is None:
+            # the verse's own timing is kept for unsegmented words
+            content.append(word)
+            continue
+
+        begin, end = segment
+        content.append(
+            word.model_copy(
+                update={"begin": begin - timing.begin, "end": end - timing.begin}
+            )
+        )
+
+    return verse.model_copy(
+        update={
+            "audio_path": recitation.audio_path,
+            "audio_begin": timing.begin,
+            "audio_end": timing.end,
+            "content": content,
+        }
+    )
+
+
+def with_translation(verse: VerseInformation, translated: VerseInformation):
+    """`verse` with the word translations of `translated`, in another language"""
+    translations = {w.position: w.translation for w in translated.content}
+    content = [
+        word.model_copy(
+            update={"translation": translations.get(word.position, word.translation)}
+        )
+        for word in verse.content
+    ]
+
+    return verse.model_copy(update={"content": content})
+
+
+def translate_clips(clips: List[ClipInformation], verse: VerseInformation):
+    """
+    `clips` extracted from another translation of `verse`, with its words; the
+    clip boundaries only depend on the recitation
+    """
+    words = {word.position: word for word in verse.content}
+    return [
+        clip.model_copy(
+            update={"content": [words.get(w.position, w) for w in clip.content]}
+        )
+        for clip in clips
+    ]
+
+
+def decoded_audio(path: str) -> PCMAudio:
+    """decode `path` once, dropping the previously decoded chapter"""
+    audio = _DECODED.get(path)
+    if audio is None:
+        release_decoded_audio()
+        audio = _DECODED[path] = PCMAudio.decode(path)
+
+    return audio
+
+
+def release_decoded_audio():
+    for audio in _DECODED.values():
+        audio.close()
+    _DECODED.clear()
+
+
+def extract_clips(verse: VerseInformation):
+    """the clips of `verse` and its `PCMAudio`, which the caller closes"""
+    path = fetch_file(verse.audio_url, namespace=audio_namespace(verse.reciter))
+    if verse.audio_end is None:
+        audio = PCMAudio.decode(path)
+    else:
+        # a view into the chapter, closing it leaves the chapter decoded
+        audio = decoded_audio(path).slice(verse.audio_begin, verse.audio_end)
+
+    silence_periods = detect_silence(
+        audio.samples,
+        audio.frame_rate,
+        audio.sample_width,
+        min_silence_len=350,
+        silence_thresh=audio.dBFS - verse.reciter.silence_threshold,
+    )
+
+    silence_periods = [(a + b) // 2 for a, b in silence_periods]
+    silence_periods = [
+        (prev, curr) for prev, curr in zip([0] + silence_periods, silence_periods)
+    ]
+
+    duration_ms = audio.duration_ms
+    if not silence_periods:
+        silence_periods = [(0, duration_ms)]
+    if abs(silence_periods[-1][1] - duration_ms) > 100:
+        silence_periods.append((silence_periods[-1][1], duration_ms))
+
+    clips: List[ClipInformation] = []
+    for index, collection in group_words(verse.content, silence_periods):
+        begin, end = silence_periods[index]
+        clips.append(
+            ClipInformation(
+                reciter=verse.reciter,
+                verse_key=verse.verse_key,
+                clip_index=index,
+                content=collection,
+                audio_url=verse.audio_url,
+                begin=begin,
+                end=end,
+            )
+        )
+
+    return clips, audio
+
+
+def prefetch_verses(
+    keys: Iterable[VerseKey],
+    reciter: Reciter,
+    lang: TranslationLanguage = "en",
+    chapter_audio: bool = False,
+):
+    """download verse metadata, recitations and page fonts in the background"""
+    keys = list(keys)
+
+    def on_metadata(key: VerseKey):
+        def callback(future):
+            # failures are reported once the verse is actually loaded
+            if future.cancelled() or future.exception() is not None:
+                return
+            try:
+                verse = verse_info_by_key(key, reciter, lang)
+            except Exception:
+                return
+
+            if not chapter_audio:
+                PREFETCHER.submit(verse.audio_url, audio_namespace(reciter))
+            for url in {w.font_url for w in verse.content}:
+                PREFETCHER.submit(url, FONT_NAMESPACE)
+
+        return callback
+
+    def on_recitation(chapter_id: int):
+        def callback(future):
+            if future.cancelled() or future.exception() is not None:
+                return
+            try:
+                recitation = chapter_recitation(chapter_id, reciter)
+            except Exception:
+                return
+
+            PREFETCHER.submit(recitation.audio_url, audio_namespace(reciter))
+
+        return callback
+
+    for key in keys:
+        url = verse_url(key, reciter, lang)
+        future = PREFETCHER.submit(url, verse_namespace(reciter))
+        future.add_done_callback(on_metadata(key))
+
+    if chapter_audio:
+        for chapter_id in sorted({key.chapter_id for key in keys}):
+            url = chapter_recitation_url(chapter_id, reciter)
+            future = PREFETCHER.submit(url, verse_namespace(reciter))
+            future.add_done_callback(on_recitation(chapter_id))
+
+
+if __name__ == "__main__":
+    verse = verse_info_by_key(
+        VerseKey(chapter_id=1, verse_id=1),
+        get_reciter_config("Mahmoud Khalil Al-Husary"),
+    )
+
+    print(extract_clips(verse)[0][0].model_dump())
@@ -1,28 +1,85 @@
-from .types import ReciterName, Reciter
-
-
-_RECITERS = {
-    "AbdulBaset AbdulSamad": 1,
-    "Abdur-Rahman as-Sudais": 2,
-    "Abu Bakr al-Shatri": 3,
-    "Hani ar-Rifai": 4,
-    "Mahmoud Khalil Al-Husary": 5,
-    "Mishari Rashid al-`Afasy": 6,
-    "Mohamed Siddiq al-Minshawi": 7,
-    "Sa'ud ash-Shuraim": 8,
-    "Khalifah Al Tunaiji": 11,
-    "Sa'ad al-Ghamdi": 12,
-    "Yasser Ad Dussary": 20,
-    "Ahmed ibn Ali al-Ajmy": 22,
-    "Abdullah Ali Jabir": 23,
-    "Bandar Baleela": 24,
-    "Maher al-Muaiqly": 25,
-    "Abdullah Hamad Abu Sharida": 26,
-}
-
-
-def get_reciter_config(name: ReciterName) -> Reciter:
-    try:
-        return Reciter(name=name, id=_RECITERS[name], silence_threshold=8)
-    except KeyError:
-        raise ValueError(f"Unsupported reciter: {name}")
+from typing import Iterable, List, Sequence, Tuple
+from bisect import bisect_left, bisect_right
+
+from .types import ReciterName, Reciter, VerseKey, TranslationLanguage, VerseWord
+from .config import CODE_VERSION, CHAPTER_PAGE_SIZE, RECITERS
+
+
+def get_reciter_config(name: ReciterName) -> Reciter:
+    try:
+        return Reciter(name=name, id=RECITERS[name], silence_threshold=8)
+    except KeyError:
+        raise ValueError(f"Unsupported reciter: {name}")
+
+
+def verse_url(key: VerseKey, reciter: Reciter, lang: TranslationLanguage = "en"):
+    url = f"https://api.quran.com//api/v4/verses/by_key/{key}"
+    url += "?" + f"language={lang}&words=true&audio={reciter.id}"
+    url += "&word_fields=" + f"code_v{CODE_VERSION},v{CODE_VERSION}_page"
+
+    return url
+
+
+def chapter_url(
+    chapter_id: int, page: int, reciter: Reciter, lang: TranslationLanguage = "en"
+):
+    url = f"https://api.quran.com/api/v4/verses/by_chapter/{chapter_id}"
+    url += "?" + f"language={lang}&words=true&audio={reciter.id}"
+    url += "&word_fields=" + f"code_v{CODE_VERSION},v{CODE_VERSION}_page"
+    url += f"&page={page}&per_page={CHAPTER_PAGE_SIZE}"
+
+    return url
+
+
+def chapter_recitation_url(chapter_id: int, reciter: Reciter):
+    url = f"https://api.quran.com/api/v4/chapter_recitations/{reciter.id}/{chapter_id}"
+    url += "?segments=true"
+
+    return url
+
+
+def chapter_pages(verse_ids: Iterable[int]) -> List[int]:
+    """the `verses/by_chapter` pages holding `verse_ids`"""
+    return sorted({(verse_id - 1) // CHAPTER_PAGE_SIZE + 1 for verse_id in verse_ids})
+
+
+def verse_namespace(reciter: Reciter):
+    return f"verse/v{CODE_VERSION}/{reciter.id}"
+
+
+def audio_namespace(reciter: Reciter):
+    return f"audio/{reciter.id}"
+
+
+def group_words(
+    words: Sequence[VerseWord], periods: Sequence[Tuple[int, int]]
+) -> List[Tuple[int, List[VerseWord]]]:
+    """
+    assign every word to the first (begin, end) period holding its timestamp,
+    `periods` must be in ascending order. returns (period index, words) pairs
+    for the periods that got any word
+    """
+    words = sorted(words, key=lambda w: w.timestamps)
+    timestamps = [w.timestamps for w in words]
+
+    groups: List[Tuple[int, List[VerseWord]]] = []
+    assigned = 0
+    # words before the cursor already belong to an earlier period
+    cursor = 0
+
+    for index, (begin, end) in enumerate(periods):
+        start = max(cursor, bisect_left(timestamps, begin))
+        stop = bisect_right(timestamps, end)
+        if start >= stop:
+            continue
+
+        groups.append((index, words[start:stop]))
+        assigned += stop - start
+        cursor = stop
+
+    if assigned != len(words):
+        raise RuntimeError(
+            f"Failed to group verse words into clips. {len(words) - assigned} words left unorganized."
+        )
+
+    return groups